@@ -11,6 +11,7 @@ from alembic import context
 from db.base import Base
 from models.api_log import APILog
 from models.visit_log import VisitLog
+from models.visit_stats import VisitCounter, VisitHourly, VisitHourlyIP
 
 # Получаем настройки из переменных окружения
 DB_USER = os.getenv("POSTGRES_USER")
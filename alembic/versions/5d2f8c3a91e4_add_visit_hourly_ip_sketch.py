@@ -0,0 +1,65 @@
+"""add visit_hourly ip_sketch
+
+Revision ID: 5d2f8c3a91e4
+Revises: ac1cfb9119b5
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+from service.config import VISITS_UNIQUE
+from service.hll import HyperLogLog, precision_for_error
+
+# revision identifiers, used by Alembic.
+revision: str = "5d2f8c3a91e4"
+down_revision: Union[str, Sequence[str], None] = "ac1cfb9119b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "visit_hourly", sa.Column("ip_sketch", sa.LargeBinary(), nullable=True)
+    )
+
+    # Режим hll включён по умолчанию: без скетчей за последние сутки
+    # unique_last_24h показывал бы около нуля до ручной пересборки
+    if context.is_offline_mode():
+        # В режиме --sql данных нет: скетчи соберёт python -m service.visit_stats rebuild
+        return
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    rows = op.get_bind().execute(
+        sa.text("""
+            SELECT DISTINCT date_trunc('hour', visited_at, 'UTC'),
+                   coalesce(ip_address, '')
+            FROM visit_log
+            WHERE visited_at >= :since
+            """),
+        {"since": now - timedelta(hours=24)},
+    )
+    precision = precision_for_error(VISITS_UNIQUE["hll_error"])
+    sketches = defaultdict(lambda: HyperLogLog(precision))
+    for bucket, ip_address in rows:
+        sketches[bucket].add(ip_address)
+
+    for bucket, sketch in sketches.items():
+        op.get_bind().execute(
+            sa.text("""
+                UPDATE visit_hourly
+                SET ip_sketch = :sketch
+                WHERE bucket = :bucket
+                """),
+            {"bucket": bucket, "sketch": sketch.to_bytes()},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("visit_hourly", "ip_sketch")
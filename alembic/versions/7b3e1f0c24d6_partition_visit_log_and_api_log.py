@@ -0,0 +1,138 @@
+"""partition visit_log and api_log
+
+Revision ID: 7b3e1f0c24d6
+Revises: 5d2f8c3a91e4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7b3e1f0c24d6"
+down_revision: Union[str, Sequence[str], None] = "5d2f8c3a91e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица: (столбец времени, размер секции). Имена секций совпадают
+# с service.partitions, дальше секции создаёт фоновая задача
+PARTITIONED = {
+    "visit_log": ("visited_at", "month"),
+    "api_log": ("timestamp", "day"),
+}
+SUFFIX_FORMAT = {"day": "%Y%m%d", "month": "%Y%m"}
+PREMAKE = 3
+
+COLUMNS = {
+    "visit_log": lambda: [
+        sa.Column("path", sa.String(length=255), nullable=False),
+        sa.Column("method", sa.String(length=10), nullable=False),
+        sa.Column("ip_address", sa.String(length=45), nullable=True),
+    ],
+    "api_log": lambda: [
+        sa.Column("method", sa.String(length=10), nullable=False),
+        sa.Column("path", sa.String(length=255), nullable=False),
+        sa.Column("ip_address", sa.String(length=45), nullable=True),
+        sa.Column("status_code", sa.Integer(), nullable=False),
+        sa.Column("duration_ms", sa.Float(), nullable=False),
+    ],
+}
+
+
+def _period_start(moment: datetime, period: str) -> datetime:
+    start = moment.astimezone(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return start.replace(day=1) if period == "month" else start
+
+
+def _next_period(start: datetime, period: str) -> datetime:
+    if period == "month":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _rename_old(table: str) -> None:
+    # Освобождаем имена таблицы, последовательности, ключа и индекса
+    op.rename_table(table, f"{table}_old")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq RENAME TO {table}_old_id_seq")
+    op.execute(
+        f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey"
+    )
+    op.execute(f"ALTER INDEX ix_{table}_id RENAME TO ix_{table}_old_id")
+
+
+def _drop_old(table: str, column: str) -> None:
+    names = ", ".join(["id", column] + [c.name for c in COLUMNS[table]()])
+    op.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM {table}_old")
+    op.execute(
+        f"SELECT setval('{table}_id_seq', "
+        f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+    )
+    op.drop_table(f"{table}_old")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc)
+
+    for table, (column, period) in PARTITIONED.items():
+        _rename_old(table)
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column(
+                column,
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=False,
+            ),
+            *COLUMNS[table](),
+            sa.PrimaryKeyConstraint("id", column),
+            postgresql_partition_by=f"RANGE ({column})",
+        )
+        op.create_index(op.f(f"ix_{table}_id"), table, ["id"], unique=False)
+
+        # Секции от самой старой записи до premake периодов вперёд
+        oldest = bind.scalar(sa.text(f"SELECT min({column}) FROM {table}_old"))
+        start = _period_start(oldest or now, period)
+        last = _period_start(now, period)
+        for _ in range(PREMAKE):
+            last = _next_period(last, period)
+        while start <= last:
+            end = _next_period(start, period)
+            op.execute(
+                f"CREATE TABLE {table}_p{start.strftime(SUFFIX_FORMAT[period])} "
+                f"PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            start = end
+
+        _drop_old(table, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (column, _) in PARTITIONED.items():
+        _rename_old(table)
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column(
+                column,
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=False,
+            ),
+            *COLUMNS[table](),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(op.f(f"ix_{table}_id"), table, ["id"], unique=False)
+        # Секции удаляются вместе с родительской таблицей
+        _drop_old(table, column)
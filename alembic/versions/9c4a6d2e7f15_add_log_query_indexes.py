@@ -0,0 +1,50 @@
+"""add log query indexes
+
+Revision ID: 9c4a6d2e7f15
+Revises: 7b3e1f0c24d6
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c4a6d2e7f15"
+down_revision: Union[str, Sequence[str], None] = "7b3e1f0c24d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы на секционированных таблицах создаются и на всех секциях
+    op.create_index(
+        "ix_visit_log_visited_at_ip_address",
+        "visit_log",
+        ["visited_at", "ip_address"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_api_log_timestamp_brin",
+        "api_log",
+        ["timestamp"],
+        unique=False,
+        postgresql_using="brin",
+    )
+    op.create_index(
+        "ix_api_log_path_timestamp",
+        "api_log",
+        ["path", "timestamp"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_api_log_path_timestamp", table_name="api_log")
+    op.drop_index("ix_api_log_timestamp_brin", table_name="api_log")
+    op.drop_index("ix_visit_log_visited_at_ip_address", table_name="visit_log")
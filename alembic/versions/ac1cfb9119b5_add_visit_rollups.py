@@ -0,0 +1,68 @@
+"""add visit rollups
+
+Revision ID: ac1cfb9119b5
+Revises: fc0b796e15c8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ac1cfb9119b5"
+down_revision: Union[str, Sequence[str], None] = "fc0b796e15c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "visit_hourly",
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("visits", sa.Integer(), nullable=False),
+        sa.Column("unique_ips", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket"),
+    )
+    op.create_table(
+        "visit_hourly_ip",
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ip_address", sa.String(length=45), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "ip_address"),
+    )
+    op.create_table(
+        "visit_counter",
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Заполняем агрегаты из уже накопленных визитов
+    op.execute("""
+        INSERT INTO visit_hourly_ip (bucket, ip_address)
+        SELECT DISTINCT date_trunc('hour', visited_at, 'UTC'), coalesce(ip_address, '')
+        FROM visit_log
+        """)
+    op.execute("""
+        INSERT INTO visit_hourly (bucket, visits, unique_ips)
+        SELECT date_trunc('hour', visited_at, 'UTC') AS bucket,
+               count(*),
+               count(DISTINCT coalesce(ip_address, ''))
+        FROM visit_log
+        GROUP BY bucket
+        """)
+    op.execute(
+        "INSERT INTO visit_counter (name, value) "
+        "SELECT 'total', count(*) FROM visit_log"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("visit_counter")
+    op.drop_table("visit_hourly_ip")
+    op.drop_table("visit_hourly")
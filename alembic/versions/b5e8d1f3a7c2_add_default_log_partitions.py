@@ -0,0 +1,33 @@
+"""add default log partitions
+
+Revision ID: b5e8d1f3a7c2
+Revises: 9c4a6d2e7f15
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e8d1f3a7c2"
+down_revision: Union[str, Sequence[str], None] = "9c4a6d2e7f15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("visit_log", "api_log")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Строки вне созданных секций попадают сюда, а не в ошибку вставки;
+    # service.partitions переносит их, создавая нужную секцию
+    for table in TABLES:
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TABLE {table}_default")
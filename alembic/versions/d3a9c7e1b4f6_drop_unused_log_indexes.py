@@ -0,0 +1,49 @@
+"""drop unused log indexes
+
+Revision ID: d3a9c7e1b4f6
+Revises: b5e8d1f3a7c2
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d3a9c7e1b4f6"
+down_revision: Union[str, Sequence[str], None] = "b5e8d1f3a7c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Статистика читается из visit_hourly, api_log приложение не читает:
+    # эти индексы только замедляли вставки
+    op.drop_index("ix_api_log_path_timestamp", table_name="api_log")
+    op.drop_index("ix_api_log_timestamp_brin", table_name="api_log")
+    op.drop_index("ix_visit_log_visited_at_ip_address", table_name="visit_log")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_visit_log_visited_at_ip_address",
+        "visit_log",
+        ["visited_at", "ip_address"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_api_log_timestamp_brin",
+        "api_log",
+        ["timestamp"],
+        unique=False,
+        postgresql_using="brin",
+    )
+    op.create_index(
+        "ix_api_log_path_timestamp",
+        "api_log",
+        ["path", "timestamp"],
+        unique=False,
+    )
@@ -1,12 +1,15 @@
 # app/cat.py
+import asyncio
 import logging
+from collections import deque
 
 import httpx
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
 
-from service.config import CACHE_TTL
-from service.decorators import cached_route
+from service.config import CAT_POOL
+from service.decorators import conditional_get
+from service.http_client import get_http_client
 from service.variables import CAT_FALLBACK
 
 logger = logging.getLogger(__name__)
@@ -20,40 +23,123 @@ class CatResponse(BaseModel):
     height: int
 
 
-async def get_cat_data() -> CatResponse | None:
+async def get_cat_batch(client: httpx.AsyncClient, limit: int) -> list[CatResponse]:
     url = "https://api.thecatapi.com/v1/images/search"
     try:
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if not data:
-                logger.warning("Пустой ответ от API кота")
-                return None
-            return CatResponse(**data[0])
+        response = await client.get(url, params={"limit": limit})
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            logger.warning("Пустой ответ от API кота")
+            return []
+        return [CatResponse(**item) for item in data]
     except httpx.ConnectTimeout:
         logger.error(f"Таймаут подключения к API кота")
-        return None
+        return []
     except httpx.HTTPStatusError as e:
         logger.error(f"Ошибка HTTP {e.response.status_code}: {e}")
-        return None
+        return []
     except (httpx.RequestError, Exception) as e:
         logger.error(f"Ошибка при получении кота: {e}")
-        return None
+        return []
 
 
-@router.get("/cat", tags=["Cat"])
-@router.get("/cat?nocache=true", tags=["Service"])
-@cached_route(
-    "cat_cache",
-    ttl=CACHE_TTL["cat_cache"],
-    fallback_data={"cat": CAT_FALLBACK},
-    source="cat",
-)
-async def get_cat(request: Request) -> dict:
-    cat_data = await get_cat_data()
+class CatPool:
+    """Запас котов в кольцевом буфере.
+
+    Один запрос к API приносит batch_size котов, каждый запрос к /api/cat
+    забирает одного. Когда в буфере остаётся меньше low_water, запас
+    пополняется в фоне, так что ответы не ждут внешний API.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = CAT_POOL["batch_size"],
+        capacity: int = CAT_POOL["capacity"],
+        low_water: int = CAT_POOL["low_water"],
+    ):
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self._buffer: deque[CatResponse] = deque(maxlen=capacity)
+        self._refill_task: asyncio.Task | None = None
+        # Последний выданный кот — на случай, если API недоступен
+        self._last: CatResponse | None = None
+        self.upstream_calls = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def fetch(self, client: httpx.AsyncClient) -> list[CatResponse]:
+        self.upstream_calls += 1
+        return await get_cat_batch(client, self.batch_size)
+
+    async def _refill(self, client: httpx.AsyncClient) -> None:
+        batch = await self.fetch(client)
+        if batch:
+            self._buffer.extend(batch)
+            logger.info(f"🐱 Запас котов пополнен: {len(self._buffer)}")
+
+    def _start_refill(self, client: httpx.AsyncClient) -> asyncio.Task:
+        # Одна выборка за раз, параллельные вызовы ждут её же
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill(client))
+        return self._refill_task
+
+    async def refill(self, client: httpx.AsyncClient) -> int:
+        await asyncio.shield(self._start_refill(client))
+        return len(self._buffer)
+
+    async def top_up(self, client: httpx.AsyncClient) -> int:
+        """Пополнение, только если запас ниже low_water (для планировщика)"""
+        if len(self._buffer) < self.low_water:
+            return await self.refill(client)
+        return len(self._buffer)
+
+    async def get(
+        self, client: httpx.AsyncClient, fresh: bool = False
+    ) -> CatResponse | None:
+        if fresh:
+            # Свежая выборка: отдаём первого, остальных в запас
+            batch = await self.fetch(client)
+            if not batch:
+                return None
+            self._buffer.extend(batch[1:])
+            self._last = batch[0]
+            return batch[0]
+
+        if not self._buffer:
+            await self.refill(client)
+        if not self._buffer:
+            return self._last
+
+        self._last = self._buffer.popleft()
+        if len(self._buffer) < self.low_water:
+            self._start_refill(client)
+        return self._last
+
+    def clear(self) -> None:
+        self._buffer.clear()
+        self._last = None
+
+
+cat_pool = CatPool()
+
+
+async def load_cat(client: httpx.AsyncClient, nocache: bool = False) -> dict:
+    cat_data = await cat_pool.get(client, fresh=nocache)
 
     if cat_data is None:
         return {"cat": CAT_FALLBACK, "status": "fallback"}
 
     return {"cat": cat_data, "status": "success"}
+
+
+@router.get("/cat", tags=["Cat"])
+@router.get("/cat?nocache=true", tags=["Service"])
+@conditional_get
+async def get_cat(
+    request: Request, client: httpx.AsyncClient = Depends(get_http_client)
+) -> dict:
+    force = request.query_params.get("nocache") == "true"
+    # Без заголовков общего кэша: каждый запрос получает нового кота из запаса
+    return await load_cat(client=client, nocache=force)
@@ -1,33 +1,44 @@
 # app/notes.py
 import logging
-from typing import List
+from typing import Optional
 from urllib.parse import urlencode
 
 from fastapi import APIRouter, BackgroundTasks, Form, HTTPException, Request, status
 from fastapi.responses import RedirectResponse
 
 from service.cache import delete_cached
-from service.decorators import cached_route, log_route
-from service.service import notes_storage
+from service.decorators import cached_route, conditional_get, log_route
+from service.service import (
+    ItemNotFoundError,
+    StorageFullError,
+    StorageReadError,
+    notes_storage,
+)
 from service.config import MAX_NOTE_LENGTH, MAX_NOTES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+STORAGE_UNAVAILABLE = "Хранилище заметок недоступно, попробуйте позже"
+
 
 @router.post("/notes/add", tags=["Notes"])
 def add_note(
     request: Request, note: str = Form(...), background_tasks: BackgroundTasks = None
 ) -> RedirectResponse:
-    notes: List[str] = notes_storage.get_all()
-
     error_msg = None
     if not note.strip():
         error_msg = "Заметка не может быть пустой"
-    elif len(notes) >= MAX_NOTES:
-        error_msg = "Превышено максимальное количество заметок"
     elif len(note) > MAX_NOTE_LENGTH:
         error_msg = "Заметка слишком длинная"
+    else:
+        # Лимит проверяется под блокировкой хранилища, по состоянию с диска
+        try:
+            notes_storage.add(note, max_items=MAX_NOTES)
+        except StorageFullError:
+            error_msg = "Превышено максимальное количество заметок"
+        except StorageReadError:
+            raise HTTPException(status_code=503, detail={"error": STORAGE_UNAVAILABLE})
 
     if error_msg:
         # Если запрос ожидает HTML, делаем редирект с ошибкой
@@ -36,7 +47,6 @@ def add_note(
         # Иначе — API-ошибка
         raise HTTPException(status_code=400, detail={f"error": error_msg})
 
-    notes_storage.add(note)
     if background_tasks:
         background_tasks.add_task(delete_cached, "notes")
     return RedirectResponse("/", status_code=status.HTTP_303_SEE_OTHER)
@@ -44,25 +54,36 @@ def add_note(
 
 @router.post("/notes/delete/{note_id}", tags=["Notes"])
 def delete_note(
-    note_id: int, background_tasks: BackgroundTasks = None
+    note_id: int,
+    expected: Optional[str] = Form(None),
+    background_tasks: BackgroundTasks = None,
 ) -> RedirectResponse:
-    notes = notes_storage.get_all()
-    if note_id < 0 or note_id >= len(notes):
+    # expected — текст заметки, которую видел клиент: если список успели
+    # изменить и индекс сдвинулся, удалять чужую заметку нельзя
+    try:
+        notes_storage.delete(note_id, expected=expected)
+    except ItemNotFoundError:
         raise HTTPException(status_code=404, detail={f"error": "Заметка не найдена"})
-    notes_storage.delete(note_id)
+    except StorageReadError:
+        raise HTTPException(status_code=503, detail={"error": STORAGE_UNAVAILABLE})
     if background_tasks:
         background_tasks.add_task(delete_cached, "notes")
     return RedirectResponse("/", status_code=status.HTTP_303_SEE_OTHER)
 
 
+@cached_route("notes", last_modified=notes_storage.last_modified)
+async def load_notes(nocache: bool = False) -> dict:
+    notes = notes_storage.snapshot(force_refresh=nocache).items
+    return {"notes": notes}
+
+
 @router.get("/notes", tags=["Notes"])
 @router.get("/notes?nocache=true", tags=["Service"])
-@cached_route("notes")
 @log_route("/notes")
+@conditional_get
 async def get_notes(request: Request) -> dict:
     force = request.query_params.get("nocache") == "true"
-    notes = notes_storage.get_all(force_refresh=force)
-    return {"notes": notes}
+    return await load_notes(nocache=force, as_response=True)
 
 
 def _error_redirect(message: str) -> RedirectResponse:
@@ -1,65 +1,202 @@
-# app/quotes.py
 import logging
 import random
-from typing import Dict, List
+from bisect import bisect_right
+from typing import AsyncIterator, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from service.decorators import cached_route, log_route
+from service.cache import encode_json
+from service.decorators import cached_route, conditional_get, log_route
+from service.quote_store import quote_store
+from service.search import quote_index
 from service.service import quotes_storage
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+NDJSON = "application/x-ndjson"
+# Верхняя граница limit для постраничной выдачи
+MAX_PAGE_SIZE = 100
+# Цитат в одном фрагменте потока NDJSON
+STREAM_BATCH = 100
+
+
+@cached_route("quotes", last_modified=quotes_storage.last_modified, public=True)
+async def load_quotes(nocache: bool = False) -> Dict[str, List[Dict]]:
+    quotes = quotes_storage.snapshot(force_refresh=nocache).items
+    if not quotes:
+        raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+    return {"quotes": quotes}
+
+
+def _quotes_by_position(nocache: bool = False):
+    """Цитаты с доступом по номеру: quotes.bin через mmap или срез JsonStorage"""
+    store = quote_store()
+    if store is not None:
+        return store
+    return quotes_storage.snapshot(force_refresh=nocache).items
+
+
+# Последний проверенный срез и идут ли в нём ID по возрастанию
+_id_order: tuple = (None, False)
+
+
+def _ids_ascending(quotes) -> bool:
+    """ID строго возрастают; у quotes.bin признак записан при сборке,
+    срез JsonStorage проверяется один раз"""
+    global _id_order
+    if hasattr(quotes, "ids_sorted"):
+        return quotes.ids_sorted
+    if _id_order[0] is not quotes:
+        ids = [quote["ID"] for quote in quotes]
+        _id_order = (quotes, all(a < b for a, b in zip(ids, ids[1:])))
+    return _id_order[1]
+
+
+def _page_after(quotes, after_id: Optional[int]) -> int:
+    """Номер первой цитаты после after_id"""
+    if after_id is None:
+        return 0
+    if _ids_ascending(quotes):
+        return bisect_right(quotes, after_id, key=lambda quote: quote["ID"])
+    # ID не по порядку: бинарный поиск дал бы неверную страницу
+    for position in range(len(quotes)):
+        if quotes[position]["ID"] == after_id:
+            return position + 1
+    return len(quotes)
+
+
+def _page_body(page: List[Dict], has_more: bool) -> Dict:
+    return {"quotes": page, "next_after_id": page[-1]["ID"] if has_more else None}
+
+
+def _page(quotes, start: int, limit: int) -> Dict:
+    page = [quotes[i] for i in range(start, min(start + limit, len(quotes)))]
+    return _page_body(page, start + limit < len(quotes))
+
+
+def _wants_ndjson(request: Optional[Request]) -> bool:
+    return request is not None and NDJSON in request.headers.get("accept", "")
+
+
+def _stream(quotes, start: int, limit: Optional[int]) -> StreamingResponse:
+    """Цитаты по одной строке JSON, без сборки всего ответа в памяти"""
+    stop = len(quotes) if limit is None else min(start + limit, len(quotes))
+
+    # Асинхронный генератор пачками строк: синхронный Starlette обходил бы
+    # в пуле потоков, с переходом на каждый фрагмент
+    async def chunks() -> AsyncIterator[bytes]:
+        for batch in range(start, stop, STREAM_BATCH):
+            end = min(batch + STREAM_BATCH, stop)
+            yield b"".join(encode_json(quotes[i]) + b"\n" for i in range(batch, end))
+
+    return StreamingResponse(chunks(), media_type=NDJSON)
+
+
+# Не public и без Last-Modified: nginx и браузер закрепили бы одну
+# «случайную» цитату за всеми запросами
+@cached_route("quotes_random")
+async def load_random_quote(nocache: bool = False) -> Dict:
+    quotes = _quotes_by_position(nocache)
+    if quotes:
+        return {"quotes": random.choice(quotes)}
+    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+
+
+async def search_quotes(
+    author: str = "", q: str = "", nocache: bool = False
+) -> Dict[str, List[Dict]]:
+    # Поиск по индексу дешевле записи в кэш, поэтому ключ на каждый запрос не заводим
+    index = await quote_index(force_refresh=nocache)
+    results = index.search(q=q, author=author)
+    if results:
+        return {"quotes": results}
+    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+
+
+@cached_route(
+    lambda quote_id, **k: f"quote_{quote_id}",
+    last_modified=quotes_storage.last_modified,
+    public=True,
+)
+async def load_quote(quote_id: int, nocache: bool = False) -> Dict[str, Dict]:
+    quotes = _quotes_by_position(nocache)
+    if 0 <= quote_id < len(quotes):
+        return {"quotes": quotes[quote_id]}
+    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+
 
 @router.get("/quotes", tags=["Quotes"])
 @router.get("/cat?nocache=true", tags=["Service"])
-@cached_route("quotes")
 @log_route("/quotes")
-async def get_quotes(request: Request) -> Dict[str, List[Dict]]:
+@conditional_get
+async def get_quotes(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+):
+    """Все цитаты; с limit — страница после after_id (в ответе next_after_id),
+    с Accept: application/x-ndjson — поток по одной цитате в строке"""
     force = request.query_params.get("nocache") == "true"
-    quotes = quotes_storage.get_all(force_refresh=force)
+    if limit is None and after_id is None and not _wants_ndjson(request):
+        return await load_quotes(nocache=force, as_response=True)
+
+    quotes = _quotes_by_position(force)
     if not quotes:
         raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
-    return {"quotes": quotes}
+    start = _page_after(quotes, after_id)
+    if _wants_ndjson(request):
+        return _stream(quotes, start, limit)
+    return _page(quotes, start, limit or MAX_PAGE_SIZE)
 
 
 @router.get("/quotes/random", tags=["Quotes"])
 @router.get("/quotes/random?nocache=true", tags=["Service"])
-@cached_route("quotes_random")
 @log_route("/quotes/random")
+@conditional_get
 async def get_random_quote(request: Request) -> Dict:
     force = request.query_params.get("nocache") == "true"
-    quotes = quotes_storage.get_all(force_refresh=force)
-    if quotes:
-        return {"quotes": random.choice(quotes)}
-    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+    return await load_random_quote(nocache=force, as_response=True)
 
 
 @router.get("/quotes/search", tags=["Quotes"])
 @router.get("/quotes/search?nocache=true", tags=["Service"])
-@cached_route(
-    lambda request, *a, **k: f"quotes_search_{request.query_params.get('author', '').lower()}"
-)
 @log_route("/quotes/search")
+@conditional_get
 async def search_quote(
-    author: str = "", request: Request = None
-) -> Dict[str, List[Dict]]:
+    author: str = "",
+    q: str = "",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    request: Request = None,
+):
+    """Поиск по автору (author) и полнотекстовый по автору и тексту (q);
+    limit, after_id и NDJSON — как у /quotes"""
     force = request.query_params.get("nocache") == "true" if request else False
-    quotes = quotes_storage.get_all(force_refresh=force)
-    results = [q for q in quotes if author.lower() in q.get("author", "").lower()]
-    if results:
-        return {"quotes": results}
-    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+    if limit is None and after_id is None and not _wants_ndjson(request):
+        return await search_quotes(author=author, q=q, nocache=force)
+
+    # Курсор сравнивается с ключом сортировки, а не ищется в полном списке
+    ndjson = _wants_ndjson(request)
+    index = await quote_index(force_refresh=force)
+    page, has_more = index.search_page(
+        q=q,
+        author=author,
+        after_id=after_id,
+        limit=limit if ndjson else limit or MAX_PAGE_SIZE,
+    )
+    if not page and after_id is None:
+        raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+    if ndjson:
+        return _stream(page, 0, None)
+    return _page_body(page, has_more)
 
 
 @router.get("/quotes/{quote_id}", tags=["Quotes"])
 @router.get("/quotes/{quote_id}?nocache=true", tags=["Service"])
-@cached_route(lambda request, quote_id, *a, **k: f"quote_{quote_id}")
 @log_route("/quotes/{quote_id}")
+@conditional_get
 async def get_quote_by_id(quote_id: int, request: Request) -> Dict[str, Dict]:
     force = request.query_params.get("nocache") == "true"
-    quotes = quotes_storage.get_all(force_refresh=force)
-    if 0 <= quote_id < len(quotes):
-        return {"quotes": quotes[quote_id]}
-    raise HTTPException(status_code=404, detail={"error": "Цитаты не найдены."})
+    return await load_quote(quote_id=quote_id, nocache=force, as_response=True)
@@ -8,31 +8,32 @@
 - Количество уникальных посетителей за последние 24 часа
 """
 
-from datetime import datetime, timedelta
-
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.session import get_db
-from models.visit_log import VisitLog
+from db.session import get_async_db
+from service.visit_stats import read_visit_stats
 
 router = APIRouter()
 
 
-@router.get("/visits", tags=["Visits"])
-async def get_visits(request: Request, db: Session = Depends(get_db)) -> dict:
+async def load_visits(db: AsyncSession) -> dict:
     """
-    Получение статистики посещений.
+    Подсчёт статистики посещений.
+
+    Используется эндпоинтом `/api/visits` и главной страницей напрямую,
+    без HTTP-запроса к самому себе. Данные берутся из почасовых агрегатов
+    (см. `service.visit_stats`), а не подсчётом по всей таблице visit_log;
+    сутки — это текущий час и 23 предыдущих.
 
     Args:
-        request (Request): Объект запроса FastAPI
-        db (Session): Сессия базы данных, внедряемая через FastAPI dependency
+        db (AsyncSession): Асинхронная сессия базы данных
 
     Returns:
         dict: Словарь со статистикой посещений, содержащий:
             - total: общее количество посещений
             - last_24h: количество посещений за последние 24 часа
-            - unique: количество уникальных посетителей за последние 24 часа
+            - unique_last_24h: количество уникальных посетителей за последние 24 часа
 
     Example:
         {
@@ -44,22 +45,23 @@ async def get_visits(request: Request, db: Session = Depends(get_db)) -> dict:
             "status": "success"
         }
     """
-    total_visits = db.query(VisitLog).count()
-    last_day = datetime.now() - timedelta(days=1)
-    last_day_count = db.query(VisitLog).filter(VisitLog.visited_at >= last_day).count()
+    stats = await read_visit_stats(db)
+
+    return {"visits": stats, "status": "success"}
 
-    unique_visits = (
-        db.query(VisitLog.ip_address)
-        .filter(VisitLog.visited_at >= last_day)
-        .distinct()
-        .count()
-    )
 
-    return {
-        "visits": {
-            "total": total_visits,
-            "last_24h": last_day_count,
-            "unique_last_24h": unique_visits,
-        },
-        "status": "success",
-    }
+@router.get("/visits", tags=["Visits"])
+async def get_visits(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> dict:
+    """
+    Получение статистики посещений.
+
+    Args:
+        request (Request): Объект запроса FastAPI
+        db (AsyncSession): Сессия базы данных, внедряемая через FastAPI dependency
+
+    Returns:
+        dict: Статистика посещений, см. `load_visits`
+    """
+    return await load_visits(db)
@@ -1,14 +1,14 @@
 # app/weather.py
 import logging
 from datetime import datetime, timedelta, timezone
-from venv import logger
 
 import httpx
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
 
-from service.decorators import cached_route
-from service.config import CACHE_TTL
+from service.decorators import cached_route, conditional_get
+from service.config import CACHE_STALE, CACHE_TTL
+from service.http_client import get_http_client
 from service.variables import WEATHER_FALLBACK, latitude, longitude
 
 logger = logging.getLogger(__name__)
@@ -98,34 +98,33 @@ def to_moscow_time(iso_time: str) -> str:
     return moscow_dt.strftime("%H:%M")
 
 
-async def fetch_weather() -> WeatherResponse | None:
+async def fetch_weather(client: httpx.AsyncClient) -> WeatherResponse | None:
     url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current_weather=true"
     try:
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            raw_weather = data["current_weather"]
-
-            processed_weather = {
-                "temperature": raw_weather["temperature"],
-                "windspeed": raw_weather["windspeed"],
-                "wind_direction": wind_direction_to_text(raw_weather["winddirection"]),
-                "weather_text": weather_code_to_text(raw_weather["weathercode"]),
-                "is_day": raw_weather["is_day"],
-                "moscow_time": to_moscow_time(raw_weather["time"]),
-            }
-
-            return WeatherResponse(
-                latitude=data["latitude"],
-                longitude=data["longitude"],
-                generationtime_ms=data["generationtime_ms"],
-                utc_offset_seconds=data["utc_offset_seconds"],
-                timezone=data["timezone"],
-                timezone_abbreviation=data["timezone_abbreviation"],
-                elevation=data["elevation"],
-                current_weather=CurrentWeather(**processed_weather),
-            )
+        response = await client.get(url)
+        response.raise_for_status()
+        data = response.json()
+        raw_weather = data["current_weather"]
+
+        processed_weather = {
+            "temperature": raw_weather["temperature"],
+            "windspeed": raw_weather["windspeed"],
+            "wind_direction": wind_direction_to_text(raw_weather["winddirection"]),
+            "weather_text": weather_code_to_text(raw_weather["weathercode"]),
+            "is_day": raw_weather["is_day"],
+            "moscow_time": to_moscow_time(raw_weather["time"]),
+        }
+
+        return WeatherResponse(
+            latitude=data["latitude"],
+            longitude=data["longitude"],
+            generationtime_ms=data["generationtime_ms"],
+            utc_offset_seconds=data["utc_offset_seconds"],
+            timezone=data["timezone"],
+            timezone_abbreviation=data["timezone_abbreviation"],
+            elevation=data["elevation"],
+            current_weather=CurrentWeather(**processed_weather),
+        )
     except httpx.HTTPStatusError as e:
         logger.error(f"Ошибка API: {e}")
         return None
@@ -134,16 +133,26 @@ async def fetch_weather() -> WeatherResponse | None:
         return None
 
 
-@router.get("/weather", tags=["Weather"])
-@router.get("/weather?nocache=true", tags=["Service"])
 @cached_route(
     "weather_cache",
     ttl=CACHE_TTL["weather_cache"],
     fallback_data=WEATHER_FALLBACK,
     source="weather",
+    public=True,
+    **CACHE_STALE["weather_cache"],
 )
-async def weather(request: Request) -> dict:
-    weather_data = await fetch_weather()
+async def load_weather(client: httpx.AsyncClient, nocache: bool = False) -> dict:
+    weather_data = await fetch_weather(client)
     if weather_data is None:
         return {"weather": WEATHER_FALLBACK, "status": "fallback"}
     return {"weather": weather_data, "status": "success"}
+
+
+@router.get("/weather", tags=["Weather"])
+@router.get("/weather?nocache=true", tags=["Service"])
+@conditional_get
+async def weather(
+    request: Request, client: httpx.AsyncClient = Depends(get_http_client)
+) -> dict:
+    force = request.query_params.get("nocache") == "true"
+    return await load_weather(client=client, nocache=force, as_response=True)
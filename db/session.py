@@ -1,10 +1,11 @@
 # db/session.py
 
 import os
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 # Берём данные подключения из переменных среды
@@ -24,9 +25,18 @@ connection_url = URL.create(
     database=DB_NAME,
 )
 
+# Синхронный движок: Alembic и скрипты обслуживания
 engine = create_engine(connection_url, future=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для маршрутов и логирования, не блокирует event loop
+async_engine = create_async_engine(
+    connection_url.set(drivername="postgresql+asyncpg"), pool_pre_ping=True
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -34,3 +44,8 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -12,32 +12,83 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cat import cat_pool, load_cat
 from app.cat import router as cat_router
+from app.notes import load_notes
 from app.notes import router as notes_router
+from app.quotes import load_random_quote
 from app.quotes import router as quotes_router
+from app.visits import load_visits
 from app.visits import router as visits_router
+from app.weather import load_weather
 from app.weather import router as weather_router
-from db.session import get_db
+from db.session import async_engine, get_async_db
 from middleware.log_api_requests import APILogMiddleware
-from service.config import LOGGING_CONFIG
-from service.logging_utils import log_visit
+from service.cache_backend import create_backend
+from service.config import (CACHE_REFRESH, CACHE_TTL, LOGGING_CONFIG,
+                            PARTITIONS, VISITS_UNIQUE)
+from service.http_client import (close_http_client, get_http_client,
+                                 init_http_client)
+from service.logging_utils import api_log_writer, log_visit
+from service.partitions import maintenance_loop
+from service.scheduler import RefreshScheduler
 from service.service import get_version
-from service.variables import (BASE_DIR, BASE_URL, CAT_FALLBACK,
-                               VISITS_FALLBACK, WEATHER_FALLBACK)
+from service.visit_stats import visit_sketches
+from service.variables import (BASE_DIR, CAT_FALLBACK, VISITS_FALLBACK,
+                               WEATHER_FALLBACK)
 
 logging.config.dictConfig(LOGGING_CONFIG)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Инициализация кеша
-    FastAPICache.init(InMemoryBackend())
+    # Инициализация кеша: LRU в памяти, с REDIS_URL — плюс общий для воркеров Redis
+    FastAPICache.init(create_backend())
+    cache_backend = FastAPICache.get_backend()
+    if hasattr(cache_backend, "start"):
+        await cache_backend.start()
+    # Один пул соединений к внешним API на всё время жизни приложения
+    client = await init_http_client()
+    await api_log_writer.start()
+
+    # Обновляем ключи внешних API до того, как они устареют
+    scheduler = RefreshScheduler()
+    scheduler.register(
+        "weather_cache",
+        lambda: load_weather(client, nocache=True),
+        CACHE_TTL["weather_cache"],
+    )
+    scheduler.register(
+        "cat_pool", lambda: cat_pool.top_up(client), CACHE_TTL["cat_cache"]
+    )
+    if VISITS_UNIQUE["mode"] == "hll":
+        # Скетчи уникальных IP живут в памяти, в БД сохраняем периодически
+        scheduler.register(
+            "visit_sketches", visit_sketches.flush, VISITS_UNIQUE["flush_interval"]
+        )
+    if CACHE_REFRESH["enabled"]:
+        await scheduler.start()
+    app.state.refresh_scheduler = scheduler
+    # Секции visit_log и api_log: новые заранее, старые по сроку хранения;
+    # не зависит от CACHE_REFRESH, первый проход — сразу при старте
+    partitions_task = None
+    if PARTITIONS["enabled"]:
+        partitions_task = asyncio.create_task(maintenance_loop())
+
     logging.info(f"🟢 Приложение запущено")
     yield
+    await scheduler.stop()
+    if partitions_task is not None:
+        partitions_task.cancel()
+    await close_http_client()
+    await api_log_writer.stop()
+    await visit_sketches.flush()
+    await async_engine.dispose()
     backend = FastAPICache.get_backend()
+    if hasattr(backend, "stats"):
+        logging.info(f"🗃️ Кэш: {backend.stats}")
     if hasattr(backend, "close"):
         await backend.close()
 
@@ -62,32 +113,35 @@ templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
 
-async def fetch_data(url: str) -> Dict[str, Any] | None:
-    try:
-        async with httpx.AsyncClient(timeout=3) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
-    except Exception as e:
-        logging.error(f"Ошибка при запросе к {url}: {str(e)}")
-        return None  # Возвращаем None вместо проброса исключения
+def unwrap_result(name: str, result: Any) -> Dict[str, Any] | None:
+    """Результат сервиса для главной страницы или None, если он упал"""
+    if isinstance(result, BaseException):
+        logging.error(f"Ошибка при получении {name}: {result}")
+        return None
+    return result
 
 
 @app.get("/", include_in_schema=False)
 async def index(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(get_http_client),
 ) -> Response:
     """Главная страница"""
-    weather_data, cat, quote, notes_data, visits = await asyncio.gather(
-        fetch_data(f"{BASE_URL}/api/weather"),
-        fetch_data(f"{BASE_URL}/api/cat"),
-        fetch_data(f"{BASE_URL}/api/quotes/random"),
-        fetch_data(f"{BASE_URL}/api/notes"),
-        fetch_data(f"{BASE_URL}/api/visits"),
+    # Сервисы вызываются напрямую, с тем же кэшированием, что и у /api/*
+    results = await asyncio.gather(
+        load_weather(client),
+        load_cat(client),
+        load_random_quote(),
+        load_notes(),
+        load_visits(db),
         return_exceptions=True,  # Позволяет обрабатывать исключения как результаты
     )
-    log_visit(request, db)
+    names = ("weather", "cat", "quotes", "notes", "visits")
+    weather_data, cat, quote, notes_data, visits = (
+        unwrap_result(name, result) for name, result in zip(names, results)
+    )
+    await log_visit(request, db)
 
     # Обрабатываем возможные ошибки
     notes = notes_data["notes"] if isinstance(notes_data, dict) else []
@@ -95,14 +149,14 @@ async def index(
     weather = (
         weather_data["weather"]
         if isinstance(weather_data, dict) and "weather" in weather_data
-        else {"weather": WEATHER_FALLBACK}
+        else WEATHER_FALLBACK
     )
-    cat = cat["cat"] if isinstance(cat, dict) else {"cat": CAT_FALLBACK}
+    cat = cat["cat"] if isinstance(cat, dict) and "cat" in cat else CAT_FALLBACK
 
     visits_data = (
         visits["visits"]
         if isinstance(visits, dict) and "visits" in visits
-        else {"visits": VISITS_FALLBACK}
+        else VISITS_FALLBACK
     )
     version = get_version()
     error = request.query_params.get("error")
@@ -2,13 +2,12 @@
 import logging
 import os
 import time
+from datetime import datetime, timezone
 
-from fastapi import Request
-from sqlalchemy.orm import Session
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from db.session import engine
-from models.api_log import APILog
+from service.logging_utils import api_log_writer
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +16,7 @@ EXCLUDE_PATHS_START = ("/static", "/docs", "/redoc", "/openapi.json")
 EXCLUDE_PATHS_FULL = {"/favicon.ico", "/health"}
 
 
-class APILogMiddleware(BaseHTTPMiddleware):
+class APILogMiddleware:
     """Middleware для логирования API запросов в базу данных.
 
     Отслеживает и логирует следующие параметры API запросов:
@@ -32,58 +31,79 @@ class APILogMiddleware(BaseHTTPMiddleware):
         EXCLUDE_PATHS_FULL: Множество полных путей, которые не нужно логировать
 
     Примечание:
-        - Логи сохраняются в базу данных через модель APILog
+        - Чистое ASGI-middleware: не оборачивает тело ответа и не создаёт
+          лишних задач, поэтому стриминг и фоновые задачи работают как обычно
+        - Логи сохраняются в базу данных через модель APILog пачками,
+          через очередь api_log_writer (см. service.logging_utils)
         - Логирование отключается при запуске тестов (когда установлена переменная TESTING)
         - Статические файлы и служебные эндпоинты (/docs, /redoc и т.д.) не логируются
     """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Обработка и логирование API запроса.
 
         Аргументы:
-                request (Request): Входящий HTTP запрос
-                call_next: Следующий обработчик в цепочке middleware
-
-        Возвращает:
-                Response: Ответ от следующего обработчика
+                scope (Scope): ASGI scope запроса
+                receive: Канал получения сообщений от клиента
+                send: Канал отправки сообщений клиенту
 
         Примечание:
-                Сохраняет детали запроса в базу данных, включая длительность,
-                код статуса и IP адрес
+                Код статуса берётся из сообщения http.response.start, а
+                длительность фиксируется на последнем фрагменте тела, так что
+                потоковые ответы измеряются целиком
         """
-        start_time = time.time()
-
-        response = await call_next(request)
-
-        duration_ms = round((time.time() - start_time) * 1000, 2)
-
         # На тестах не пишем в БД
-        if os.getenv("TESTING"):
-            return response
-
-        # Собираем данные для логирования
-        ip_address = request.headers.get("x-real-ip") or request.client.host
-        method = request.method
-        path = request.url.path
-        status_code = response.status_code
+        if scope["type"] != "http" or os.getenv("TESTING"):
+            await self.app(scope, receive, send)
+            return
 
         # Игнорируем служебные пути и статические файлы
+        path = scope["path"]
         if path.startswith(EXCLUDE_PATHS_START) or path in EXCLUDE_PATHS_FULL:
-            return response
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = datetime.now(timezone.utc)
+        start_time = time.perf_counter()
+        status_code = 500
+        logged = False
+
+        def log_request() -> None:
+            nonlocal logged
+            logged = True
+            duration_ms = round((time.perf_counter() - start_time) * 1000, 2)
+            client = scope.get("client")
+            ip_address = Headers(scope=scope).get("x-real-ip") or (
+                client[0] if client else None
+            )
+            # Кладём в очередь, в БД запись уйдёт пачкой из фоновой задачи
+            api_log_writer.submit(
+                {
+                    "timestamp": timestamp,
+                    "method": scope["method"][:10],  # Ограничиваем длину
+                    "path": path[:255],
+                    "ip_address": (ip_address or "")[:45],
+                    "status_code": status_code,
+                    "duration_ms": duration_ms,
+                }
+            )
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                log_request()
 
-        # Логируем в БД
         try:
-            with Session(engine) as db:
-                log = APILog(
-                    method=method[:10],  # Ограничиваем длину
-                    path=path[:255],
-                    ip_address=(ip_address or "")[:45],
-                    status_code=status_code,
-                    duration_ms=duration_ms,
-                )
-                db.add(log)
-                db.commit()
-        except Exception as e:
-            logger.error(f"Ошибка при логировании API-запроса: {e}", exc_info=True)
-
-        return response
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Ответ не был отправлен до конца (исключение или обрыв)
+            if not logged:
+                log_request()
@@ -6,10 +6,19 @@ from db.base import Base
 
 class APILog(Base):
     __tablename__ = "api_log"
+    # Журнал только пишется, чтений в приложении нет; старые записи уходят
+    # удалением секций, поэтому вторичных индексов нет
+    __table_args__ = (
+        # Секции по дням, см. service.partitions; ключ включает столбец секционирования
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     timestamp = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        server_default=func.now(),
+        primary_key=True,
+        nullable=False,
     )
     method = Column(String(10), nullable=False)
     path = Column(String(255), nullable=False)
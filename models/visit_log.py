@@ -7,10 +7,19 @@ from db.base import Base  # путь зависит от твоей структ
 
 class VisitLog(Base):
     __tablename__ = "visit_log"
+    # Приложение читает агрегаты visit_stats, а не журнал, поэтому вторичных
+    # индексов нет: каждая вставка за них платила бы
+    __table_args__ = (
+        # Секции по месяцам, см. service.partitions; ключ включает столбец секционирования
+        {"postgresql_partition_by": "RANGE (visited_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     visited_at = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        server_default=func.now(),
+        primary_key=True,
+        nullable=False,
     )
     path = Column(String(255), nullable=False)
     method = Column(String(10), nullable=False)
@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, LargeBinary, String
+
+from db.base import Base
+
+
+class VisitHourly(Base):
+    """Посещения и уникальные IP за час, обновляются при каждом визите"""
+
+    __tablename__ = "visit_hourly"
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    unique_ips = Column(Integer, nullable=False, default=0)
+    # Регистры HyperLogLog по IP за час (режим VISITS_UNIQUE["mode"] == "hll")
+    ip_sketch = Column(LargeBinary, nullable=True)
+
+
+class VisitHourlyIP(Base):
+    """IP-адреса, встреченные за час (для уникальных за сутки)"""
+
+    __tablename__ = "visit_hourly_ip"
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    ip_address = Column(String(45), primary_key=True)
+
+
+class VisitCounter(Base):
+    """Накопительные счётчики, например общее число посещений"""
+
+    __tablename__ = "visit_counter"
+
+    name = Column(String(32), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
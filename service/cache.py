@@ -1,13 +1,28 @@
 # service/cache.py
+import hashlib
+import json
 import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from typing import AsyncIterator
 
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
 from fastapi_cache import FastAPICache
 
-from service.config import CACHE_TTL
+from service.config import CACHE_REDIS, CACHE_TTL
+
+try:
+    import orjson
+except ImportError:  # без orjson кодируем стандартным json
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+JSON_MEDIA_TYPE = "application/json"
+
 
 def get_backend():
     backend = FastAPICache.get_backend()
@@ -16,6 +31,34 @@ def get_backend():
     return backend
 
 
+def shared_backend():
+    """Бэкенд с общим для воркеров уровнем (Redis) или None"""
+    try:
+        backend = get_backend()
+    except (AssertionError, RuntimeError):
+        return None
+    return backend if hasattr(backend, "lease") else None
+
+
+@asynccontextmanager
+async def refresh_lease(key: str) -> AsyncIterator[bool]:
+    """Аренда обновления ключа среди воркеров; без Redis она всегда своя"""
+    backend = shared_backend()
+    if backend is None:
+        yield True
+        return
+    async with backend.lease(key, CACHE_REDIS["lease"]) as leader:
+        yield leader
+
+
+async def wait_for_refresh(key: str):
+    """Запись, которую положил в L2 воркер с арендой, или None, если её нет"""
+    backend = shared_backend()
+    if backend is None or not await backend.wait_released(key, CACHE_REDIS["lease"]):
+        return None
+    return (await backend.get_shared(key))[1]
+
+
 async def get_cached(key: str):
     backend = get_backend()
     return await backend.get(key)
@@ -35,10 +78,90 @@ async def delete_cached(key: str):
         await backend.set(key, None, expire=1)
 
 
+def encode_json(data) -> bytes:
+    """Тело ответа JSON; модели pydantic кодируются как в FastAPI"""
+    if orjson is not None:
+        return orjson.dumps(data, default=jsonable_encoder)
+    return json.dumps(
+        data, default=jsonable_encoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def make_entry(
+    data, ttl: int, ok: bool = True, last_modified: float | None = None
+) -> dict:
+    """Запись кэша: данные, готовое тело ответа с ETag и момент,
+    до которого они свежие.
+
+    Тело кодируется один раз при записи, попадание в кэш отдаёт его как есть.
+    last_modified — время изменения источника (unix time), если оно известно.
+    """
+    body = encode_json(data)
+    return {
+        "data": data,
+        "body": body,
+        "media_type": JSON_MEDIA_TYPE,
+        "etag": make_etag(body),
+        "last_modified": last_modified,
+        "expires_at": time.time() + ttl,
+        "ok": ok,
+    }
+
+
+def entry_response(entry: dict) -> Response:
+    """Ответ с телом и валидаторами из записи кэша, без повторной сериализации"""
+    body = entry.get("body")
+    if body is None:
+        body = encode_json(entry["data"])
+    headers = {"ETag": entry.get("etag") or make_etag(body)}
+    if entry.get("last_modified"):
+        headers["Last-Modified"] = formatdate(entry["last_modified"], usegmt=True)
+    return Response(
+        body, media_type=entry.get("media_type", JSON_MEDIA_TYPE), headers=headers
+    )
+
+
+def shared_cache_headers(
+    max_age: int, stale_while_revalidate: int = 0, stale_if_error: int = 0
+) -> dict:
+    """Заголовки для общего кэша (nginx): прокси хранит ответ max_age секунд,
+    браузер каждый раз переспрашивает с ETag"""
+    directives = ["public", "max-age=0", f"s-maxage={max_age}"]
+    if stale_while_revalidate:
+        directives.append(f"stale-while-revalidate={stale_while_revalidate}")
+    if stale_if_error:
+        directives.append(f"stale-if-error={stale_if_error}")
+    # Порядок важен: nginx читает stale-* из Cache-Control, только если
+    # X-Accel-Expires идёт после него
+    return {"Cache-Control": ", ".join(directives), "X-Accel-Expires": str(max_age)}
+
+
+def entry_cache_headers(
+    entry: dict, stale_while_revalidate: int = 0, stale_if_error: int = 0
+) -> dict:
+    """Заголовки общего кэша на оставшееся время жизни записи"""
+    if not entry.get("ok") or "expires_at" not in entry:
+        # fallback и прочие ответы без записи в кэше прокси не хранит
+        return {"Cache-Control": "no-cache"}
+    remaining = max(0, int(entry["expires_at"] - time.time()))
+    return shared_cache_headers(remaining, stale_while_revalidate, stale_if_error)
+
+
+def entry_staleness(entry: dict) -> float:
+    """Сколько секунд запись уже просрочена (отрицательное — ещё свежая)"""
+    return time.time() - entry["expires_at"]
+
+
 def ttl_logic(
     data: dict,
     source: str = "auto",
     return_ttl: bool = False,
+    min_ttl: int = 0,
 ) -> int | bool:
 
     try:
@@ -67,7 +190,10 @@ def ttl_logic(
             # TTL до конца текущего интервала
             ttl = int((interval_end - now_utc).total_seconds())
             # Если вдруг ttl=0, то возвращаем полный интервал, чтобы не было нулевого TTL
-            return ttl if ttl > 0 else interval_sec
+            if ttl <= 0:
+                return interval_sec
+            # Данные, полученные у самого конца интервала, живут и весь следующий
+            return ttl + interval_sec if ttl < min_ttl else ttl
 
         # Кэш валиден, если текущее время меньше конца интервала
         return now_utc < interval_end
@@ -0,0 +1,464 @@
+# service/cache_backend.py
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple, Optional, Tuple
+
+from fastapi_cache.types import Backend
+
+from service.config import CACHE_MEMORY, CACHE_REDIS
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis нужен только для общего кэша воркеров
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Item(NamedTuple):
+    value: object
+    expires_at: float
+    size: int
+    family: str
+
+
+def deep_size(value, seen: Optional[set] = None) -> int:
+    """sys.getsizeof объекта вместе со всем, что в нём лежит"""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += deep_size(vars(value), seen)
+    return size
+
+
+def entry_size(value) -> int:
+    """Память записи: готовое тело ответа и разобранные данные (data) вместе"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return deep_size(value)
+
+
+class BoundedMemoryBackend(Backend):
+    """Кэш в памяти процесса с вытеснением давно не читанных записей (LRU).
+
+    Ограничен числом записей и суммарным размером; для семейств ключей
+    (префиксов из quotas) действует свой предел записей, при его превышении
+    вытесняется самая старая запись того же семейства. В отличие от
+    InMemoryBackend хранилище своё у каждого экземпляра.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MEMORY["max_entries"],
+        max_bytes: int = CACHE_MEMORY["max_bytes"],
+        quotas: Optional[dict] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quotas = CACHE_MEMORY["quotas"] if quotas is None else quotas
+        self._items: OrderedDict[str, _Item] = OrderedDict()
+        # Порядок использования внутри семейства, для квот
+        self._families: dict[str, OrderedDict[str, None]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Вытеснения по семействам ("" — ключи без квоты)
+        self.evictions: Counter = Counter()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._items),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": dict(self.evictions),
+        }
+
+    def family(self, key: str) -> str:
+        # Самый длинный подходящий префикс
+        matches = [prefix for prefix in self.quotas if key.startswith(prefix)]
+        return max(matches, key=len) if matches else ""
+
+    def _remove(self, key: str) -> _Item:
+        item = self._items.pop(key)
+        del self._families[item.family][key]
+        self.bytes -= item.size
+        return item
+
+    def _evict(self, key: str) -> None:
+        item = self._remove(key)
+        self.evictions[item.family] += 1
+        logger.debug(f"🧹 Кэш {key} вытеснен ({item.size} байт)")
+
+    def _get(self, key: str) -> Optional[_Item]:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        if item.expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self._families[item.family].move_to_end(key)
+        self.hits += 1
+        return item
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[object]]:
+        item = self._get(key)
+        if item is None:
+            return 0, None
+        return int(item.expires_at - time.time()), item.value
+
+    async def get(self, key: str) -> Optional[object]:
+        item = self._get(key)
+        return item.value if item else None
+
+    async def set(self, key: str, value, expire: Optional[int] = None) -> None:
+        if key in self._items:
+            self._remove(key)
+        size = entry_size(value)
+        if size > self.max_bytes:
+            logger.warning(f"Кэш {key}: {size} байт больше предела, не сохраняем")
+            return
+
+        family = self.family(key)
+        members = self._families.setdefault(family, OrderedDict())
+        quota = self.quotas.get(family)
+        while quota is not None and members and len(members) >= quota:
+            self._evict(next(iter(members)))
+        while self._items and (
+            len(self._items) >= self.max_entries or self.bytes + size > self.max_bytes
+        ):
+            self._evict(next(iter(self._items)))
+
+        expires_at = time.time() + expire if expire else float("inf")
+        self._items[key] = _Item(value, expires_at, size, family)
+        members[key] = None
+        self.bytes += size
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        if namespace:
+            keys = [k for k in self._items if k.startswith(namespace)]
+        elif key:
+            keys = [key] if key in self._items else []
+        else:
+            keys = list(self._items)
+        for k in keys:
+            self._remove(k)
+        return len(keys)
+
+
+def dump_value(value, expires_at: float) -> bytes:
+    """Значение для L2: строка метаданных JSON и готовое тело ответа.
+
+    У записи кэша (make_entry) данные восстанавливаются из тела, поэтому
+    второй раз не хранятся; прочие значения целиком кодируются в JSON.
+    """
+    meta = {"expires_at": expires_at, "entry": None}
+    if isinstance(value, dict) and isinstance(value.get("body"), bytes):
+        meta["entry"] = {k: v for k, v in value.items() if k not in ("data", "body")}
+        body = value["body"]
+    else:
+        body = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    return json.dumps(meta).encode("utf-8") + b"\n" + body
+
+
+def load_value(raw: bytes) -> Tuple[object, float]:
+    header, _, body = raw.partition(b"\n")
+    meta = json.loads(header)
+    value = json.loads(body)
+    if meta["entry"] is not None:
+        value = {**meta["entry"], "data": value, "body": body}
+    return value, meta["expires_at"]
+
+
+# Снять аренду, только если она всё ещё наша (могла истечь и перейти к другому)
+RELEASE_LEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class TieredBackend(Backend):
+    """Двухуровневый кэш: L1 в памяти воркера, L2 в Redis, общий для всех.
+
+    Чтение идёт из L1, промах — из L2 с переносом в L1 на оставшийся срок,
+    так что источник вызывается один раз на всех воркеров. Запись и сброс
+    попадают в оба уровня и публикуются в канал pub/sub: остальные воркеры
+    удаляют ключ из своего L1 и при следующем чтении берут его из L2.
+
+    Обновление ключа идёт под арендой (SET ключ:lock NX PX): источник
+    вызывает один воркер, остальные ждут её снятия и читают его запись
+    из L2. Общие списки (push_shared / pop_shared) — запас значений,
+    который один воркер пополняет, а все разбирают.
+
+    Если Redis недоступен, кэш продолжает работать только на L1: аренда
+    считается своей, подписка восстанавливается с нарастающей паузой,
+    а L1 сбрасывается один раз, когда подписка вернулась.
+    """
+
+    def __init__(
+        self,
+        redis,
+        l1: Optional[BoundedMemoryBackend] = None,
+        prefix: str = CACHE_REDIS["prefix"],
+        channel: str = CACHE_REDIS["channel"],
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+        poll_interval: float = 0.05,
+    ):
+        self.redis = redis
+        self.l1 = l1 or BoundedMemoryBackend()
+        self.prefix = prefix
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.poll_interval = poll_interval
+        # По нему воркер узнаёт и пропускает собственные сообщения
+        self.sender = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self.subscribed = False
+        self.l2_hits = 0
+        self.l2_errors = 0
+        self.invalidations = 0
+        self.lease_waits = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            **self.l1.stats,
+            "l2_hits": self.l2_hits,
+            "l2_errors": self.l2_errors,
+            "invalidations": self.invalidations,
+            "lease_waits": self.lease_waits,
+        }
+
+    def _l2_failed(self, action: str, e: Exception) -> None:
+        self.l2_errors += 1
+        logger.warning(f"Кэш L2 ({action}) недоступен: {e}")
+
+    async def _publish(self, **message) -> None:
+        try:
+            await self.redis.publish(
+                self.channel, json.dumps({"sender": self.sender, **message})
+            )
+        except Exception as e:
+            self._l2_failed("publish", e)
+
+    async def get_shared(self, key: str) -> Tuple[int, Optional[object]]:
+        """Ключ прямо из L2, минуя L1; найденное переносится в L1"""
+        try:
+            raw = await self.redis.get(self.prefix + key)
+        except Exception as e:
+            self._l2_failed("get", e)
+            return 0, None
+        if raw is None:
+            return 0, None
+
+        value, expires_at = load_value(raw)
+        remaining = int(expires_at - time.time())
+        if remaining <= 0:
+            return 0, None
+        self.l2_hits += 1
+        await self.l1.set(key, value, expire=remaining)
+        return remaining, value
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[object]]:
+        ttl, value = await self.l1.get_with_ttl(key)
+        if value is not None:
+            return ttl, value
+        return await self.get_shared(key)
+
+    async def get(self, key: str) -> Optional[object]:
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key: str, value, expire: Optional[int] = None) -> None:
+        await self.l1.set(key, value, expire=expire)
+        expires_at = time.time() + expire if expire else float("inf")
+        try:
+            await self.redis.set(
+                self.prefix + key, dump_value(value, expires_at), ex=expire or None
+            )
+        except Exception as e:
+            self._l2_failed("set", e)
+            return
+        await self._publish(key=key)
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        """Сброс ключа, префикса или (без аргументов) всего кэша на всех уровнях"""
+        count = await self.l1.clear(namespace, key)
+        try:
+            if key and not namespace:
+                keys = [self.prefix + key]
+            else:
+                match = self.prefix + (namespace or "") + "*"
+                keys = [k async for k in self.redis.scan_iter(match=match)]
+            if keys:
+                count = max(count, await self.redis.delete(*keys))
+        except Exception as e:
+            self._l2_failed("clear", e)
+        await self._publish(namespace=namespace, key=key)
+        return count
+
+    def _lease_key(self, key: str) -> str:
+        return f"{self.prefix}{key}:lock"
+
+    @asynccontextmanager
+    async def lease(self, key: str, ttl: float) -> AsyncIterator[bool]:
+        """Аренда обновления key на ttl секунд: True — обновляет этот воркер.
+
+        Без Redis аренда считается своей: каждый воркер обновляет сам.
+        """
+        lock = self._lease_key(key)
+        token = uuid.uuid4().hex
+        held = False
+        try:
+            held = bool(await self.redis.set(lock, token, nx=True, px=int(ttl * 1000)))
+            leader = held
+        except Exception as e:
+            self._l2_failed("lease", e)
+            leader = True
+        if not leader:
+            self.lease_waits += 1
+        try:
+            yield leader
+        finally:
+            if held:
+                try:
+                    await self.redis.eval(RELEASE_LEASE, 1, lock, token)
+                except Exception as e:
+                    self._l2_failed("lease", e)
+
+    async def wait_released(self, key: str, timeout: float) -> bool:
+        """Ждёт, пока другой воркер снимет аренду key; False — не дождались"""
+        lock = self._lease_key(key)
+        deadline = time.monotonic() + timeout
+        try:
+            while await self.redis.exists(lock):
+                if time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            self._l2_failed("lease", e)
+            return False
+        return True
+
+    async def push_shared(self, name: str, values: list) -> bool:
+        """Дописывает values в общий для воркеров список name"""
+        try:
+            await self.redis.rpush(self.prefix + name, *values)
+        except Exception as e:
+            self._l2_failed("rpush", e)
+            return False
+        return True
+
+    async def pop_shared(self, name: str, count: int) -> list:
+        """Забирает до count значений из начала общего списка name"""
+        try:
+            values = await self.redis.lpop(self.prefix + name, count)
+        except Exception as e:
+            self._l2_failed("lpop", e)
+            return []
+        return values or []
+
+    async def _invalidate(self, data) -> None:
+        message = json.loads(data)
+        if message.get("sender") == self.sender:
+            return
+        self.invalidations += 1
+        if message.get("namespace"):
+            await self.l1.clear(namespace=message["namespace"])
+        elif message.get("key"):
+            await self.l1.clear(key=message["key"])
+        else:
+            await self.l1.clear()
+
+    async def _listen(self) -> None:
+        delay = self.retry_delay
+        missed = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.subscribed = True
+                delay = self.retry_delay
+                if missed:
+                    # Пока подписки не было, чужие изменения прошли мимо L1:
+                    # сбрасываем его один раз, свежие записи есть в L2
+                    await self.l1.clear()
+                    missed = False
+                    logger.info("Подписка на сброс кэша восстановлена, L1 сброшен")
+                while True:
+                    # get_message с таймаутом: ожидание не упирается в socket_timeout
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None and message["type"] == "message":
+                        await self._invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # L1 не трогаем: пока Redis недоступен, он единственный кэш
+                self._l2_failed("subscribe", e)
+                self.subscribed = False
+                missed = True
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.redis.aclose()
+
+
+def create_backend() -> Backend:
+    """L1+L2, если задан REDIS_URL и установлен redis, иначе только L1"""
+    if not CACHE_REDIS["url"]:
+        return BoundedMemoryBackend()
+    if aioredis is None:
+        logger.warning("REDIS_URL задан, но пакет redis не установлен: только L1")
+        return BoundedMemoryBackend()
+    timeout = CACHE_REDIS["timeout"]
+    redis = aioredis.from_url(
+        CACHE_REDIS["url"],
+        socket_timeout=timeout,
+        socket_connect_timeout=timeout,
+        # PING в простаивающей подписке: оборванное соединение заметим
+        health_check_interval=30,
+    )
+    return TieredBackend(redis)
@@ -1,5 +1,6 @@
 # service/config.py
 import logging
+import os
 import sys
 
 logger = logging.getLogger(__name__)
@@ -62,6 +63,117 @@ CACHE_TTL = {
     "cat_cache": 300,
 }
 
+# Кэш маршрутов в памяти процесса: предел записей и байт, quotas — предел
+# записей для ключей с заданным префиксом, чтобы ключи из пользовательского
+# ввода (quote_{id}) не вытесняли остальные. Байты записи — sys.getsizeof
+# готового тела и разобранных данных со всем вложенным; объекты, общие
+# с хранилищем (срез цитат), тоже засчитываются, так что оценка сверху
+CACHE_MEMORY = {
+    "max_entries": int(os.getenv("CACHE_MAX_ENTRIES", "1000")),
+    "max_bytes": int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    "quotas": {"quote_": 200},
+}
+
+# Общий для воркеров второй уровень кэша (Redis). Без REDIS_URL каждый воркер
+# живёт только со своим кэшем в памяти; channel — канал pub/sub для сброса
+# записей в памяти остальных воркеров; timeout — предел на подключение и
+# команду, сек, чтобы недоступный Redis не держал запросы; lease — срок
+# аренды обновления ключа одним воркером, сек (не меньше времени обновления)
+CACHE_REDIS = {
+    "url": os.getenv("REDIS_URL", ""),
+    "prefix": os.getenv("CACHE_REDIS_PREFIX", "fastapi-service:cache:"),
+    "channel": "fastapi-service:cache-invalidate",
+    "timeout": float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5")),
+    "lease": 10,
+}
+
+# Окна устаревшего кэша, сек: stale_while_revalidate — отдаём старое значение,
+# пока в фоне идёт обновление; stale_if_error — пока источник недоступен
+CACHE_STALE = {
+    "weather_cache": {"stale_while_revalidate": 300, "stale_if_error": 3600},
+}
+
+# Запас котов: сколько брать за один запрос к API, сколько хранить
+# и при каком остатке пополнять
+CAT_POOL = {
+    "batch_size": 10,
+    "capacity": 50,
+    "low_water": 5,
+    "share": 5,  # сколько котов воркер забирает из общего запаса в Redis
+}
+
+# Фоновое обновление кэша до конца интервала ttl_logic
+CACHE_REFRESH = {
+    "enabled": not IS_TESTING,
+    "lead": 20,  # за сколько секунд до конца интервала обновлять
+    "jitter": 10,  # случайный сдвиг, чтобы ключи не обновлялись одновременно
+    "timeout": 10,  # ограничение на одно обновление
+    "max_concurrency": 2,  # одновременных обновлений
+}
+
+# Очередь записи api_log: размер, пачка на один INSERT и период сброса, сек
+API_LOG_QUEUE = {
+    "max_size": int(os.getenv("API_LOG_QUEUE_SIZE", "10000")),
+    "batch_size": 200,
+    "flush_interval": 2.0,
+}
+
+# Уникальные посетители за сутки: "hll" — оценка по почасовым HyperLogLog-скетчам
+# с заданной стандартной ошибкой, "exact" — точный DISTINCT по visit_hourly_ip
+VISITS_UNIQUE = {
+    "mode": os.getenv("VISITS_UNIQUE_MODE", "hll"),
+    "hll_error": float(os.getenv("VISITS_HLL_ERROR", "0.01")),
+    "sync_interval": 60,  # как часто подтягивать скетчи других процессов, сек
+    "flush_interval": 60,  # как часто сохранять свои скетчи в БД, сек
+}
+
+# Секционирование visit_log и api_log по времени: period — размер секции
+# ("day" или "month"), retention_days — сколько хранить, premake — сколько
+# секций создавать заранее, expired — "drop" удаляет старые секции,
+# "detach" отсоединяет их в отдельные таблицы для архива. Строки вне секций
+# попадают в секцию DEFAULT и переносятся при создании нужной секции
+PARTITIONS = {
+    "enabled": not IS_TESTING,
+    "interval": 3600,  # период обслуживания, сек
+    "premake": 3,
+    "expired": os.getenv("PARTITION_EXPIRED", "drop"),
+    "tables": {
+        "visit_log": {
+            "column": "visited_at",
+            "period": "month",
+            "retention_days": int(os.getenv("VISIT_LOG_RETENTION_DAYS", "365")),
+        },
+        "api_log": {
+            "column": "timestamp",
+            "period": "day",
+            "retention_days": int(os.getenv("API_LOG_RETENTION_DAYS", "30")),
+        },
+    },
+}
+
+# Как часто JSON-хранилища проверяют файл на диске (mtime, размер, inode), сек
+STORAGE_CHECK_INTERVAL = float(os.getenv("STORAGE_CHECK_INTERVAL", "1.0"))
+
+# Хранилище заметок: "journal" — снимок notes.json плюс журнал изменений,
+# "json" — перезапись всего файла при каждом изменении. fsync: "always" —
+# после каждой записи, "interval" — не чаще fsync_interval сек, "never"
+NOTES_STORAGE = {
+    "mode": os.getenv("NOTES_STORAGE", "journal"),
+    "fsync": os.getenv("NOTES_FSYNC", "always"),
+    "fsync_interval": 1.0,
+    "compact_bytes": 64 * 1024,  # размер журнала, после которого он сжимается
+}
+
 # Максимальное количество заметок и длина заметки
 MAX_NOTES = 10
 MAX_NOTE_LENGTH = 250
+
+# Общий HTTP-клиент для внешних API (погода, коты)
+HTTP_CLIENT = {
+    "max_connections": int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+    "max_keepalive_connections": int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+    "keepalive_expiry": float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    "connect_timeout": float(os.getenv("HTTP_CONNECT_TIMEOUT", "2")),
+    "read_timeout": float(os.getenv("HTTP_READ_TIMEOUT", "3")),
+    "http2": os.getenv("HTTP2", "false").lower() == "true",
+}
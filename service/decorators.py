@@ -1,58 +1,204 @@
 # service/decorators.py
+import asyncio
 import logging
 import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
 from functools import wraps
 
-from fastapi import Request
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
 
-from service.cache import get_cached, set_cached, ttl_logic
-from service.config import CACHE_TTL
+from service.cache import (
+    encode_json,
+    entry_cache_headers,
+    entry_response,
+    entry_staleness,
+    get_cached,
+    make_entry,
+    make_etag,
+    refresh_lease,
+    set_cached,
+    ttl_logic,
+    wait_for_refresh,
+)
+from service.config import CACHE_REFRESH, CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
+# Загрузки, которые сейчас выполняются, по ключу кэша
+_inflight: dict[str, asyncio.Task] = {}
+# Сколько вызовов дождались уже идущей загрузки вместо своей
+coalesced_calls: Counter = Counter()
+
+
+def _find_request(args: tuple, kwargs: dict) -> Request | None:
+    # Получаем request из kwargs или args
+    request = kwargs.get("request")
+    if request is None and args:
+        for arg in args:
+            if isinstance(arg, Request):
+                return arg
+    return request
+
+
+def _forget_inflight(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Помечаем исключение прочитанным, даже если его никто не дождался
+    if not task.cancelled():
+        task.exception()
+
+
+def _start_flight(key: str, load) -> asyncio.Task:
+    task = _inflight.get(key)
+    if task is None:
+        # Отдельная задача, чтобы отмена первого запроса не отменила остальные
+        task = asyncio.create_task(load())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget_inflight(key, t))
+    return task
+
+
+async def _single_flight(key: str, load):
+    """Одна загрузка на ключ: конкурентные промахи ждут общий результат"""
+    if key in _inflight:
+        coalesced_calls[key] += 1
+        logger.info(f"🔗 Кэш {key} уже загружается, ждём результат")
+    return await asyncio.shield(_start_flight(key, load))
+
+
+def _is_fallback(result) -> bool:
+    if result is None:
+        return True
+    return isinstance(result, dict) and (
+        bool(result.get("fallback")) or result.get("status") == "fallback"
+    )
+
 
 def cached_route(
     cache_key: str,
     ttl: int | None = None,
     fallback_data: dict | None = None,
     source: str = "auto",
+    stale_while_revalidate: int = 0,
+    stale_if_error: int = 0,
+    last_modified=None,
+    public: bool = False,
 ):
+    """Кэширование результата маршрута или сервиса.
+
+    stale_while_revalidate: сколько секунд после TTL отдавать старое значение
+        сразу, обновляя его одной фоновой задачей.
+    stale_if_error: сколько секунд после TTL отдавать последнее удачное значение,
+        если источник упал или вернул fallback.
+    last_modified: функция без аргументов, возвращающая время изменения
+        источника (unix time) для заголовка Last-Modified.
+    public: разрешить общему кэшу (nginx) хранить ответ до конца TTL записи.
+
+    Маршрут вызывает функцию с as_response=True и получает Response с уже
+    закодированным телом из кэша; остальные вызовы получают данные.
+    """
+    stale_window = max(stale_while_revalidate, stale_if_error)
+
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Получаем request из kwargs или args
-            request = kwargs.get("request")
-            if request is None and args:
-                for arg in args:
-                    if isinstance(arg, Request):
-                        request = arg
-                        break
-
-            use_cache = request and request.query_params.get("nocache") != "true"
+        async def wrapper(*args, as_response: bool = False, **kwargs):
+            request = _find_request(args, kwargs)
+
+            # Внутри процесса (без request) признак nocache передаётся аргументом
+            if request is not None:
+                use_cache = request.query_params.get("nocache") != "true"
+            else:
+                use_cache = not kwargs.get("nocache", False)
             key = cache_key(*args, **kwargs) if callable(cache_key) else cache_key
 
-            if use_cache:
-                cached = await get_cached(key)
-                if cached and ttl_logic(cached, source=source):
-                    logger.info(f"✅ Кэш {key}")
-                    return cached
-                logger.info(f"♻️ Кэш {key} устарел или отсутствует")
+            entry = await get_cached(key) if use_cache or stale_if_error else None
+
+            def last_good():
+                # Последнее удачное значение в пределах окна stale_if_error
+                if stale_if_error and entry and entry.get("ok"):
+                    if entry_staleness(entry) <= stale_if_error:
+                        return entry
+                return None
+
+            def reply(result: dict):
+                if not as_response:
+                    return result["data"]
+                response = entry_response(result)
+                if public:
+                    response.headers.update(
+                        entry_cache_headers(
+                            result, stale_while_revalidate, stale_if_error
+                        )
+                    )
+                return response
+
+            async def load() -> dict:
+                # Источник вызывает один воркер; остальные ждут его запись в L2
+                async with refresh_lease(key) as leader:
+                    if not leader:
+                        logger.info(f"🔒 Кэш {key} обновляет другой воркер, ждём")
+                        shared = await wait_for_refresh(key)
+                        if shared and entry_staleness(shared) < 0:
+                            return shared
+                    # Свой вызов: аренда наша, без Redis или воркер не справился
+                    return await fetch()
+
+            async def fetch() -> dict:
+                # Возвращает запись кэша: общую для всех ожидающих этой загрузки
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if use_cache and (stale := last_good()):
+                        logger.warning(f"☑️ Ошибка источника {key}: {e}, отдаём кэш")
+                        return stale
+                    raise
+
+                if _is_fallback(result) and (stale := last_good()):
+                    # Удачное значение не затираем; с nocache отдаём то, что пришло
+                    logger.warning(f"☑️ Источник {key} недоступен, кэш сохранён")
+                    return stale if use_cache else {"data": result}
+
+                if isinstance(result, dict) and result.get("fallback"):
+                    logger.warning(f"☑️ Используем fallback {key}")
+                    return {"data": fallback_data or {}}
 
-            result = await func(*args, **kwargs)
+                if result is None:
+                    logger.warning(f"☑️ Используем fallback {key}")
+                    return {"data": fallback_data or {}}
 
-            if isinstance(result, dict) and result.get("fallback"):
-                logger.warning(f"☑️ Используем fallback {key}")
-                return fallback_data or {}
+                ttl_interval = ttl_logic(
+                    result,
+                    source=source,
+                    return_ttl=True,
+                    min_ttl=CACHE_REFRESH["lead"] + CACHE_REFRESH["jitter"],
+                )
+                fresh = make_entry(
+                    result,
+                    ttl_interval,
+                    ok=not _is_fallback(result),
+                    last_modified=last_modified() if last_modified else None,
+                )
+                await set_cached(key, fresh, ttl=ttl_interval + stale_window)
+                logger.info(f"🔁 Кэш {key} обновлён, TTL = {ttl_interval}")
 
-            if result is None:
-                logger.warning(f"☑️ Используем fallback {key}")
-                return fallback_data or {}
+                return fresh
 
-            ttl_interval = ttl_logic(result, source=source, return_ttl=True)
-            await set_cached(key, result, ttl=ttl_interval)
-            logger.info(f"🔁 Кэш {key} обновлён, TTL = {ttl_interval}")
+            if not use_cache:
+                return reply(await load())
 
-            return result
+            if entry:
+                staleness = entry_staleness(entry)
+                if staleness < 0 and ttl_logic(entry["data"], source=source):
+                    logger.info(f"✅ Кэш {key}")
+                    return reply(entry)
+                if 0 <= staleness <= stale_while_revalidate:
+                    logger.info(f"⏳ Кэш {key} устарел, обновляем в фоне")
+                    _start_flight(key, load)
+                    return reply(entry)
+            logger.info(f"♻️ Кэш {key} устарел или отсутствует")
+            return reply(await _single_flight(key, load))
 
         return wrapper
 
@@ -63,13 +209,7 @@ def log_route(name: str = ""):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Получаем request из kwargs или args
-            request = kwargs.get("request")
-            if request is None and args:
-                for arg in args:
-                    if isinstance(arg, Request):
-                        request = arg
-                        break
+            request = _find_request(args, kwargs)
 
             route_name = name or (request.url.path if request else func.__name__)
             start_time = time.perf_counter()
@@ -90,3 +230,64 @@ def log_route(name: str = ""):
         return wrapper
 
     return decorator
+
+
+# Заголовки, которые 304 повторяет из полного ответа
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control", "x-accel-expires")
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip().removeprefix("W/") for tag in header.split(","))
+    return etag.removeprefix("W/") in tags
+
+
+def _not_modified(request: Request, response: Response) -> bool:
+    etag = response.headers.get("etag")
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    last_modified = response.headers.get("last-modified")
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified and if_modified_since:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(
+                if_modified_since
+            )
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_get(func):
+    """ETag и If-None-Match / If-Modified-Since для маршрута.
+
+    Ответ-словарь кодируется в JSON, ответу без ETag он считается по телу;
+    Response из кэша уже несёт ETag и Last-Modified. Если клиент прислал совпадающий
+    валидатор, отдаётся пустой 304. Потоковые ответы проходят как есть.
+    """
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        request = _find_request(args, kwargs)
+        response = await func(*args, **kwargs)
+        if request is None or isinstance(response, StreamingResponse):
+            return response
+
+        if not isinstance(response, Response):
+            response = Response(encode_json(response), media_type="application/json")
+        if "etag" not in response.headers:
+            response.headers["ETag"] = make_etag(response.body)
+        if response.status_code == 200 and _not_modified(request, response):
+            headers = {
+                name: response.headers[name]
+                for name in VALIDATOR_HEADERS
+                if name in response.headers
+            }
+            return Response(status_code=304, headers=headers)
+        return response
+
+    return wrapper
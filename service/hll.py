@@ -0,0 +1,77 @@
+import math
+from hashlib import blake2b
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def precision_for_error(error: float) -> int:
+    """Число бит индекса регистра, чтобы стандартная ошибка была не больше error"""
+    precision = math.ceil(math.log2((1.04 / error) ** 2))
+    return max(MIN_PRECISION, min(MAX_PRECISION, precision))
+
+
+class HyperLogLog:
+    """Оценка числа уникальных значений в фиксированном объёме памяти.
+
+    2**precision однобайтовых регистров; стандартная ошибка 1.04 / sqrt(m).
+    Скетчи объединяются поэлементным максимумом, поэтому сутки — это
+    объединение почасовых скетчей.
+    """
+
+    def __init__(self, precision: int = 14, registers: bytes | None = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(
+                f"precision должен быть от {MIN_PRECISION} до {MAX_PRECISION}"
+            )
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is not None and len(registers) != self.m:
+            raise ValueError(f"Ожидалось {self.m} регистров, получено {len(registers)}")
+        self.registers = bytearray(registers or self.m)
+
+    @property
+    def error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str) -> bool:
+        """Добавляет значение; True, если скетч изменился"""
+        digest = blake2b(value.encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Объединение в текущий скетч"""
+        if other.precision != self.precision:
+            raise ValueError("Нельзя объединить скетчи разной точности")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision, bytes(self.registers))
+
+    def count(self) -> int:
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Поправка для малых значений: linear counting
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(int(math.log2(len(data))), data)
@@ -0,0 +1,51 @@
+import importlib.util
+import logging
+
+import httpx
+
+from service.config import HTTP_CLIENT
+
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Клиент с пулом keep-alive соединений по настройкам HTTP_CLIENT"""
+    http2 = HTTP_CLIENT["http2"]
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            "HTTP/2 недоступен: установите httpx[http2], используем HTTP/1.1"
+        )
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HTTP_CLIENT["max_connections"],
+        max_keepalive_connections=HTTP_CLIENT["max_keepalive_connections"],
+        keepalive_expiry=HTTP_CLIENT["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        HTTP_CLIENT["read_timeout"], connect=HTTP_CLIENT["connect_timeout"]
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Общий клиент; подходит как FastAPI dependency"""
+    if _client is None or _client.is_closed:
+        raise RuntimeError("HTTP-клиент не инициализирован")
+    return _client
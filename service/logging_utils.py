@@ -1,16 +1,138 @@
-# service/logging_utils.py
+import asyncio
+import logging
+from datetime import datetime, timezone
+
 from fastapi import Request
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from db.session import AsyncSessionLocal
+from models.api_log import APILog
 from models.visit_log import VisitLog
+from service.config import API_LOG_QUEUE
+from service.visit_stats import record_visit
+
+logger = logging.getLogger(__name__)
 
 
-def log_visit(request: Request, db: Session):
+async def log_visit(request: Request, db: AsyncSession):
     ip_address = request.headers.get("x-real-ip") or request.client.host
+    # Время задаём сами: по нему выбирается и секция, и часовой агрегат
+    visited_at = datetime.now(timezone.utc)
     visit = VisitLog(
+        visited_at=visited_at,
         path=request.url.path,
         method=request.method,
         ip_address=ip_address,
     )
     db.add(visit)
-    db.commit()
+    # Агрегаты обновляются в той же транзакции, что и сам визит
+    await record_visit(db, ip_address, visited_at)
+    await db.commit()
+
+
+class APILogWriter:
+    """Отложенная запись api_log пачками.
+
+    Middleware кладёт записи в ограниченную очередь и сразу отвечает,
+    фоновая задача сбрасывает их одним многострочным INSERT, как только
+    набралась пачка или прошёл flush_interval. При переполнении очереди
+    запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int = API_LOG_QUEUE["max_size"],
+        batch_size: int = API_LOG_QUEUE["batch_size"],
+        flush_interval: float = API_LOG_QUEUE["flush_interval"],
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def submit(self, record: dict) -> bool:
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Сбрасывает всё, что осталось в очереди, и останавливает задачу"""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            self._queue.put_nowait(None)  # будим ожидающий get
+        except asyncio.QueueFull:
+            pass
+        await self._task
+        self._task = None
+        logger.info(f"📝 Запись api_log остановлена: {self.stats}")
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect(self) -> list[dict]:
+        # Первую запись ждём без таймаута, остановка будит нас через None
+        record = await self._queue.get()
+        batch = [] if record is None else [record]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._stopping and self._queue.empty():
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                record = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if record is not None:
+                batch.append(record)
+        return batch
+
+    async def _flush(self, batch: list[dict]) -> None:
+        try:
+            await self._write_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Ошибка при записи {len(batch)} API-логов: {e}")
+
+    async def _write_batch(self, batch: list[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(APILog), batch)
+            await db.commit()
+
+
+api_log_writer = APILogWriter()
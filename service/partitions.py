@@ -0,0 +1,198 @@
+"""
+Обслуживание секций visit_log и api_log.
+
+Обе таблицы секционированы по диапазону времени (PARTITION BY RANGE).
+Задача заранее создаёт секции на premake периодов вперёд и отсоединяет
+или удаляет секции старше retention_days, так что очистка — это DROP
+секции, а не DELETE по всей таблице. Если обслуживание отстало, строки
+попадают в секцию {table}_default, а не теряются; при создании секции
+их диапазон переносится из неё. Запускается отдельной задачей приложения
+(сразу при старте) или вручную:
+
+    python -m service.partitions
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.session import AsyncSessionLocal, async_engine
+from service.config import PARTITIONS
+
+logger = logging.getLogger(__name__)
+
+SUFFIX_FORMAT = {"day": "%Y%m%d", "month": "%Y%m"}
+
+LIST_PARTITIONS_SQL = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = :table
+    """
+
+
+def period_start(moment: datetime, period: str) -> datetime:
+    """Начало секции (UTC), в которую попадает moment"""
+    moment = moment.astimezone(timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.replace(day=1) if period == "month" else start
+
+
+def next_period(start: datetime, period: str) -> datetime:
+    if period == "month":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(table: str, start: datetime, period: str) -> str:
+    return f"{table}_p{start.strftime(SUFFIX_FORMAT[period])}"
+
+
+def parse_partition(table: str, name: str, period: str) -> datetime | None:
+    """Начало секции по имени; None для чужих таблиц (например, архивных)"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d+)", name)
+    if not match:
+        return None
+    try:
+        start = datetime.strptime(match.group(1), SUFFIX_FORMAT[period])
+    except ValueError:
+        return None
+    return start.replace(tzinfo=timezone.utc)
+
+
+def create_partition_sql(table: str, start: datetime, period: str) -> str:
+    end = next_period(start, period)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start, period)} "
+        f"PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+
+async def _move_from_default(
+    db: AsyncSession, table: str, column: str, start: datetime, period: str
+) -> None:
+    # Секцию нельзя создать, пока в DEFAULT есть строки её диапазона:
+    # отсоединяем DEFAULT, создаём секцию и переносим строки (одна транзакция)
+    default = default_partition(table)
+    bounds = {"start": start, "end": next_period(start, period)}
+    where = f"{column} >= :start AND {column} < :end"
+    await db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    await db.execute(text(create_partition_sql(table, start, period)))
+    await db.execute(
+        text(f"INSERT INTO {table} SELECT * FROM {default} WHERE {where}"), bounds
+    )
+    await db.execute(text(f"DELETE FROM {default} WHERE {where}"), bounds)
+    await db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.warning(f"🗂️ Строки {table} перенесены из {default} в новую секцию")
+
+
+def expired_before(now: datetime, retention_days: int) -> datetime:
+    """Секции, закончившиеся не позже этого момента, можно убирать"""
+    return now.astimezone(timezone.utc) - timedelta(days=retention_days)
+
+
+async def maintain_table(
+    db: AsyncSession,
+    table: str,
+    period: str,
+    retention_days: int,
+    premake: int = PARTITIONS["premake"],
+    expired: str = PARTITIONS["expired"],
+    now: datetime | None = None,
+    column: str | None = None,
+) -> dict:
+    now = now or datetime.now(timezone.utc)
+    result = await db.execute(text(LIST_PARTITIONS_SQL), {"table": table})
+    existing = sorted(result.scalars().all())
+
+    # Периоды, строки которых лежат в DEFAULT (column нужен для переноса)
+    pending = set()
+    if column and default_partition(table) in existing:
+        bounds = await db.execute(
+            text(f"SELECT min({column}), max({column}) FROM {default_partition(table)}")
+        )
+        oldest, newest = bounds.one()
+        start = period_start(oldest, period) if oldest else None
+        while start is not None and start <= newest:
+            pending.add(start)
+            start = next_period(start, period)
+
+    periods = set(pending)
+    start = period_start(now, period)
+    for _ in range(premake + 1):
+        periods.add(start)
+        start = next_period(start, period)
+
+    created = []
+    for start in sorted(periods):
+        if start in pending:
+            await _move_from_default(db, table, column, start, period)
+        else:
+            await db.execute(text(create_partition_sql(table, start, period)))
+        created.append(partition_name(table, start, period))
+
+    removed = []
+    border = expired_before(now, retention_days)
+    for name in existing:
+        start = parse_partition(table, name, period)
+        if start is None or next_period(start, period) > border:
+            continue
+        await db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if expired == "drop":
+            await db.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+
+    await db.commit()
+    if removed:
+        action = "удалены" if expired == "drop" else "отсоединены"
+        logger.info(f"🗂️ Секции {table} {action}: {', '.join(removed)}")
+    return {"created": created, "removed": removed}
+
+
+async def maintain_partitions(now: datetime | None = None) -> dict:
+    """Обслуживание всех секционированных таблиц в отдельной сессии"""
+    report = {}
+    async with AsyncSessionLocal() as db:
+        for table, options in PARTITIONS["tables"].items():
+            report[table] = await maintain_table(
+                db,
+                table,
+                options["period"],
+                options["retention_days"],
+                now=now,
+                column=options["column"],
+            )
+    return report
+
+
+async def maintenance_loop(interval: float = PARTITIONS["interval"]) -> None:
+    """Обслуживание сразу и затем каждые interval секунд.
+
+    Своя задача, а не планировщик кэша: секции нужны, даже если фоновое
+    обновление кэша выключено. Ошибка одного прохода цикл не останавливает.
+    """
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            logger.error(f"❌ Обслуживание секций: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _main() -> None:
+    print(await maintain_partitions())
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
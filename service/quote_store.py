@@ -0,0 +1,203 @@
+"""
+Компактное хранилище цитат, читаемое через mmap.
+
+quotes.json остаётся исходным форматом, из него собирается quotes.bin:
+
+    python -m service.quote_store build
+
+Формат (little-endian):
+
+- заголовок: сигнатура, версия формата, флаги, число цитат и blake2b
+  исходного quotes.json, по которому видно, что файл устарел;
+- таблица записей фиксированного размера: ID и смещение/длина автора
+  и текста в куче;
+- куча строк UTF-8, одинаковые авторы хранятся один раз.
+
+Цитата по номеру — одно чтение записи и двух срезов кучи, без разбора
+всего корпуса. Страницы файла общие для всех воркеров через page cache.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+from service.config import STORAGE_CHECK_INTERVAL
+from service.variables import QUOTE_FILE, QUOTE_STORE_FILE
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QSTR"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHI32s")  # сигнатура, версия, флаги, число, хэш
+# ID идут строго по возрастанию: курсор after_id ищется бинарным поиском
+FLAG_IDS_SORTED = 0x1
+RECORD = struct.Struct("<qIIII")  # ID, автор (смещение, длина), текст
+
+
+def source_digest(source: Path) -> bytes:
+    digest = hashlib.blake2b(digest_size=32)
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def build_quote_store(
+    source: Path = QUOTE_FILE, target: Path = QUOTE_STORE_FILE
+) -> int:
+    """Собирает target из source; файл подменяется атомарно"""
+    with open(source, "r", encoding="utf-8") as f:
+        quotes = json.load(f)
+
+    heap = bytearray()
+    strings: dict[str, tuple[int, int]] = {}
+
+    def put(value: str) -> tuple[int, int]:
+        if value not in strings:
+            data = value.encode("utf-8")
+            strings[value] = (len(heap), len(data))
+            heap.extend(data)
+        return strings[value]
+
+    records = bytearray()
+    ids = []
+    for position, quote in enumerate(quotes):
+        author = put(quote.get("author", ""))
+        text = put(quote.get("text", ""))
+        ids.append(quote.get("ID", position))
+        records.extend(RECORD.pack(ids[-1], *author, *text))
+
+    flags = FLAG_IDS_SORTED if all(a < b for a, b in zip(ids, ids[1:])) else 0
+    if not flags:
+        logger.warning(f"ID в {source.name} не по возрастанию: курсор ищется перебором")
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, flags, len(quotes), source_digest(source)
+    )
+    tmp_path = target.with_name(target.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header + records + heap)
+        f.flush()
+        os.fsync(f.fileno())
+    # Воркеры со старым mmap продолжают читать прежний inode
+    os.replace(tmp_path, target)
+    logger.info(f"📦 {target.name}: {len(quotes)} цитат, куча {len(heap)} байт")
+    return len(quotes)
+
+
+class QuoteStore:
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, flags, self.count, self.digest = HEADER.unpack_from(
+                self._mm
+            )
+            self.ids_sorted = bool(flags & FLAG_IDS_SORTED)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path.name}: неизвестный формат")
+            self._heap = HEADER.size + self.count * RECORD.size
+            if len(self._mm) < self._heap:
+                raise ValueError(f"{path.name}: файл обрезан")
+        except (struct.error, ValueError):
+            self._mm.close()
+            raise
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._heap + offset
+        return self._mm[start : start + length].decode("utf-8")
+
+    def __getitem__(self, position: int) -> dict:
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        quote_id, a_off, a_len, t_off, t_len = RECORD.unpack_from(
+            self._mm, HEADER.size + position * RECORD.size
+        )
+        return {
+            "ID": quote_id,
+            "author": self._string(a_off, a_len),
+            "text": self._string(t_off, t_len),
+        }
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class QuoteStoreLoader:
+    """Открытый quotes.bin, если он собран из текущего quotes.json.
+
+    Подписи обоих файлов проверяются не чаще check_interval; при изменении
+    файл открывается заново. Если quotes.bin нет или он устарел, возвращается
+    None и чтение идёт из JsonStorage.
+    """
+
+    def __init__(
+        self,
+        path: Path = QUOTE_STORE_FILE,
+        source: Path = QUOTE_FILE,
+        check_interval: float = STORAGE_CHECK_INTERVAL,
+    ):
+        self.path = path
+        self.source = source
+        self.check_interval = check_interval
+        self._store: QuoteStore | None = None
+        self._signature: tuple | None = None
+        self._checked_at = float("-inf")
+
+    def _stat_signature(self) -> tuple:
+        signature = []
+        for path in (self.path, self.source):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _open(self) -> QuoteStore | None:
+        if not self.path.exists():
+            return None
+        try:
+            store = QuoteStore(self.path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Не удалось открыть {self.path.name}: {e}")
+            return None
+        if not self.source.exists() or store.digest != source_digest(self.source):
+            logger.warning(f"{self.path.name} устарел, читаем {self.source.name}")
+            store.close()
+            return None
+        return store
+
+    def get(self) -> QuoteStore | None:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            signature = self._stat_signature()
+            if signature != self._signature:
+                self._signature = signature
+                # Старое отображение не закрываем: его может читать другой запрос
+                self._store = self._open()
+        return self._store
+
+
+quote_store = QuoteStoreLoader().get
+
+
+def _main(command: str) -> None:
+    if command != "build":
+        raise SystemExit("Использование: python -m service.quote_store build")
+    count = build_quote_store()
+    print(f"{QUOTE_STORE_FILE}: {count}")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1] if len(sys.argv) > 1 else "")
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from service.config import CACHE_REFRESH
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RefreshJob:
+    name: str
+    refresh: Callable[[], Awaitable]
+    interval: int
+    runs: int = 0
+    failures: int = 0
+
+
+class RefreshScheduler:
+    """Фоновое обновление кэша незадолго до конца интервала ttl_logic.
+
+    Интервалы выровнены по часам так же, как в ttl_logic, поэтому задача
+    успевает положить свежие данные до того, как ключ устареет, и запросы
+    пользователей не попадают на пустой кэш.
+    """
+
+    def __init__(
+        self,
+        lead: int = CACHE_REFRESH["lead"],
+        jitter: int = CACHE_REFRESH["jitter"],
+        timeout: int = CACHE_REFRESH["timeout"],
+        max_concurrency: int = CACHE_REFRESH["max_concurrency"],
+    ):
+        self.lead = lead
+        self.jitter = jitter
+        self.timeout = timeout
+        self.jobs: dict[str, RefreshJob] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: list[asyncio.Task] = []
+
+    def register(
+        self, name: str, refresh: Callable[[], Awaitable], interval: int
+    ) -> RefreshJob:
+        job = RefreshJob(name=name, refresh=refresh, interval=interval)
+        self.jobs[name] = job
+        return job
+
+    def next_delay(self, job: RefreshJob, now: float | None = None) -> float:
+        """Секунды до следующего запуска: конец интервала минус lead и jitter"""
+        now = time.time() if now is None else now
+        remaining = job.interval - now % job.interval
+        delay = remaining - self.lead - random.uniform(0, self.jitter)
+        # Окно текущего интервала уже пройдено — обновляем перед следующим
+        return delay if delay > 0 else delay + job.interval
+
+    async def run_job(self, job: RefreshJob) -> bool:
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(job.refresh(), timeout=self.timeout)
+                job.runs += 1
+                logger.info(f"🔄 Фоновое обновление {job.name}")
+                return True
+            except asyncio.TimeoutError:
+                job.failures += 1
+                logger.warning(f"⏱️ Фоновое обновление {job.name}: таймаут")
+            except Exception as e:
+                job.failures += 1
+                logger.error(f"❌ Фоновое обновление {job.name}: {e}")
+            return False
+
+    async def _loop(self, job: RefreshJob) -> None:
+        # Прогреваем кэш сразу после старта
+        await self.run_job(job)
+        while True:
+            await asyncio.sleep(self.next_delay(job))
+            await self.run_job(job)
+
+    async def start(self) -> None:
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+        logger.info(f"🕒 Планировщик обновления кэша: {', '.join(self.jobs)}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,193 @@
+"""
+Обратный индекс для поиска по цитатам.
+
+Токены автора и текста приводятся к casefold, «ё» заменяется на «е»,
+последний и любые другие слова запроса совпадают по префиксу. Индекс
+строится целиком по срезу quotes_storage и подменяется одной ссылкой,
+когда срез меняется, поэтому поиск не сканирует весь корпус.
+
+Сборка идёт в отдельном потоке: пока новый индекс не готов, запросы
+получают прежний, и event loop не ждёт перестройки.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from service.service import quotes_storage
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+# Совпадение по префиксу весит меньше точного, совпадение в авторе — больше
+PREFIX_WEIGHT = 0.5
+AUTHOR_WEIGHT = 2.0
+
+
+def normalize(text: str) -> str:
+    return text.casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(normalize(text))
+
+
+class _Field:
+    """Словарь и списки вхождений одного поля"""
+
+    def __init__(self, documents: list[list[str]]):
+        postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for doc, tokens in enumerate(documents):
+            for token, tf in Counter(tokens).items():
+                postings[token].append((doc, tf))
+        self.postings = {token: tuple(docs) for token, docs in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        total = max(len(documents), 1)
+        self.idf = {
+            token: math.log(1 + total / len(docs))
+            for token, docs in self.postings.items()
+        }
+
+    def match(self, term: str) -> dict[int, float]:
+        """Документы, где есть слово с префиксом term, и вес совпадения"""
+        scores: dict[int, float] = {}
+        i = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            token = self.vocabulary[i]
+            weight = self.idf[token] * (1.0 if token == term else PREFIX_WEIGHT)
+            for doc, tf in self.postings[token]:
+                score = weight * tf
+                if score > scores.get(doc, 0.0):
+                    scores[doc] = score
+            i += 1
+        return scores
+
+
+class QuoteIndex:
+    def __init__(self, quotes: tuple):
+        self.quotes = quotes
+        self.author = _Field([tokenize(q.get("author", "")) for q in quotes])
+        self.text = _Field([tokenize(q.get("text", "")) for q in quotes])
+        # Курсор постраничной выдачи — ID цитаты, ключ сортировки — её номер
+        self.positions = {q.get("ID", doc): doc for doc, q in enumerate(quotes)}
+
+    def _match(self, q: str, author: str) -> tuple[set[int] | None, dict]:
+        """Подходящие документы (None — без условий) и их релевантность"""
+        candidates: set[int] | None = None
+        for term in tokenize(author):
+            docs = self.author.match(term).keys()
+            candidates = set(docs) if candidates is None else candidates & docs
+
+        scores: dict[int, float] = defaultdict(float)
+        for term in tokenize(q):
+            matched = self.text.match(term)
+            for doc, score in self.author.match(term).items():
+                matched[doc] = max(matched.get(doc, 0.0), score * AUTHOR_WEIGHT)
+            candidates = (
+                set(matched) if candidates is None else candidates & matched.keys()
+            )
+            for doc in candidates:
+                scores[doc] += matched[doc]
+        return candidates, scores
+
+    def search(self, q: str = "", author: str = "") -> list[dict]:
+        """Цитаты, где каждое слово author есть в авторе, а каждое слово q —
+        в авторе или тексте; с q результаты упорядочены по релевантности"""
+        candidates, scores = self._match(q, author)
+        if candidates is None:
+            return list(self.quotes)
+        ranked = sorted(candidates, key=lambda doc: (-scores.get(doc, 0.0), doc))
+        return [self.quotes[doc] for doc in ranked]
+
+    def search_page(
+        self,
+        q: str = "",
+        author: str = "",
+        after_id: int | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[dict], bool]:
+        """Результаты search() после цитаты after_id, не больше limit,
+        и признак, что есть ещё.
+
+        Курсор сравнивается по ключу (релевантность, номер), а не ищется
+        в готовом списке; сортируются только limit + 1 лучших кандидатов.
+        """
+        candidates, scores = self._match(q, author)
+        after = None
+        if after_id is not None:
+            after = self.positions.get(after_id)
+            if after is None:
+                return [], False
+
+        if candidates is None:
+            # Без условий порядок — номер цитаты, страница — срез
+            start = 0 if after is None else after + 1
+            stop = len(self.quotes) if limit is None else start + limit
+            return list(self.quotes[start:stop]), stop < len(self.quotes)
+
+        def key(doc: int) -> tuple[float, int]:
+            return (-scores.get(doc, 0.0), doc)
+
+        if after is not None:
+            cursor = key(after)
+            candidates = [doc for doc in candidates if key(doc) > cursor]
+        if limit is None:
+            docs = sorted(candidates, key=key)
+        else:
+            docs = heapq.nsmallest(limit + 1, candidates, key=key)
+        has_more = limit is not None and len(docs) > limit
+        return [self.quotes[doc] for doc in docs[:limit]], has_more
+
+
+class QuoteIndexer:
+    """Индекс текущего среза цитат с перестройкой в фоне.
+
+    Срез сверяется при каждом вызове; если он сменился, в asyncio.to_thread
+    запускается одна сборка на все запросы, а до её окончания отдаётся
+    прежний индекс. Ждать сборку приходится только самому первому запросу,
+    когда прежнего индекса ещё нет.
+    """
+
+    def __init__(self, storage=quotes_storage):
+        self.storage = storage
+        self.index: QuoteIndex | None = None
+        self._rebuild: asyncio.Task | None = None
+
+    def _build(self, items: tuple) -> QuoteIndex:
+        index = QuoteIndex(items)
+        logger.info(f"🔎 Индекс цитат перестроен: {len(items)}")
+        return index
+
+    def _finish(self, task: asyncio.Task) -> None:
+        self._rebuild = None
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(f"Ошибка сборки индекса цитат: {task.exception()}")
+            return
+        self.index = task.result()
+
+    def _start(self, items: tuple) -> asyncio.Task:
+        # Идущая сборка не дублируется; если она по старому срезу,
+        # следующий запрос после её окончания запустит новую
+        if self._rebuild is None:
+            self._rebuild = asyncio.create_task(asyncio.to_thread(self._build, items))
+            self._rebuild.add_done_callback(self._finish)
+        return self._rebuild
+
+    async def get(self, force_refresh: bool = False) -> QuoteIndex:
+        items = self.storage.snapshot(force_refresh=force_refresh).items
+        if self.index is not None and self.index.quotes is items:
+            return self.index
+        rebuild = self._start(items)
+        if self.index is None:
+            # shield: отменённый запрос не прерывает общую сборку
+            return await asyncio.shield(rebuild)
+        return self.index
+
+
+quote_index = QuoteIndexer().get
@@ -1,9 +1,20 @@
 # service/service.py
+import hashlib
 import json
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 
+from service.config import NOTES_STORAGE, STORAGE_CHECK_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только между потоками процесса
+    fcntl = None
 from service.variables import (
     BASE_DIR,
     NOTES_FILE,
@@ -28,11 +39,105 @@ def get_version() -> str:
     return f"v{version}"
 
 
+class StorageReadError(RuntimeError):
+    """Файл хранилища есть, но прочитать его не удалось"""
+
+
+class StorageFullError(RuntimeError):
+    """В хранилище уже максимум элементов"""
+
+
+class ItemNotFoundError(LookupError):
+    """По индексу нет элемента или там уже другой элемент"""
+
+
+class Snapshot(NamedTuple):
+    """Неизменяемый срез хранилища: элементы и номер версии"""
+
+    items: tuple
+    version: int
+
+
 class JsonStorage:
-    def __init__(self, file_path: Path, mutable: bool = False):
+    """Список из JSON-файла, закэшированный в памяти.
+
+    Файл перечитывается, только если изменилась его подпись (mtime, размер,
+    inode); проверка — один os.stat не чаще check_interval. Так запись
+    в другом процессе видна всем воркерам, а force_refresh лишь
+    проверяет подпись сразу, не читая файл без необходимости.
+
+    Чтение — snapshot(): один общий кортеж на все запросы до следующего
+    изменения. Изменение собирает новый кортеж и увеличивает версию
+    (copy-on-write), поэтому отданный срез никогда не меняется.
+
+    Изменения выполняются под рекомендательной блокировкой файл.lock
+    (fcntl.flock), срез перед изменением сверяется с диском уже под ней,
+    а файл пишется во временный и подменяется через os.replace. Так
+    несколько воркеров uvicorn не теряют записи друг друга, а читатель
+    всегда видит целый файл. Проверки, зависящие от содержимого (лимит
+    в add, индекс и ожидаемое значение в delete), выполняются там же,
+    под блокировкой, по состоянию с диска.
+
+    Отсутствующий файл — пустое хранилище, а нечитаемый — ошибка: читатели
+    получают прежний срез, изменения отклоняются (StorageReadError), пока
+    файл не прочитается, иначе запись затёрла бы данные на диске.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        mutable: bool = False,
+        check_interval: float = STORAGE_CHECK_INTERVAL,
+    ):
         self.file_path = file_path
         self.mutable = mutable
-        self._cache: Optional[List] = None
+        self.check_interval = check_interval
+        self._snapshot: Optional[Snapshot] = None
+        self._version = 0
+        self._signature: Optional[tuple] = None
+        self._checked_at = float("-inf")
+        self._load_failed = False
+        self.lock_path = file_path.with_name(file_path.name + ".lock")
+        # Маршруты заметок синхронные и выполняются в пуле потоков
+        self._lock = threading.RLock()
+        self._lock_file = None
+
+    def _paths(self) -> tuple:
+        return (self.file_path,)
+
+    def _stat_signature(self) -> tuple:
+        signature = []
+        for path in self._paths():
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _changed(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return self._stat_signature() != self._signature
+
+    def _reload(self) -> None:
+        # Подпись снимаем до чтения: запись во время чтения заметим при следующей проверке
+        self._signature = self._stat_signature()
+        self._checked_at = time.monotonic()
+        self._load_failed = False
+        items = self._load_file()
+        if self._load_failed:
+            # Сбитая подпись: файл перечитается при следующей проверке
+            self._signature = None
+            if self._snapshot is not None:
+                return
+        self._publish(items)
+
+    def _publish(self, items: List) -> None:
+        self._version += 1
+        self._snapshot = Snapshot(tuple(items), self._version)
 
     def _load_file(self) -> List:
         if not self.file_path.exists():
@@ -45,49 +150,285 @@ class JsonStorage:
                 if isinstance(data, list):
                     logger.debug(f"Загружено {len(data)} элементов из {self.file_path}")
                     return data
-        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"{self.file_path} содержит не список")
+        except (json.JSONDecodeError, OSError, UnicodeDecodeError) as e:
             logger.warning(f"Ошибка загрузки {self.file_path}: {e}")
 
+        self._load_failed = True
         return []
 
+    @contextmanager
+    def _locked(self):
+        """Блокировка изменения: между потоками и между процессами"""
+        with self._lock:
+            outer = self._lock_file is None
+            if outer and fcntl is not None:
+                self._lock_file = open(self.lock_path, "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if outer and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _write_atomic(self, path: Path, content: str) -> None:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
     def _save_file(self, data: List) -> None:
         if not self.mutable:
             raise RuntimeError(f"Хранилище {self.file_path} только для чтения")
 
         try:
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                logger.debug(f"Сохранено {len(data)} элементов в {self.file_path}")
+            self._write_atomic(
+                self.file_path, json.dumps(data, ensure_ascii=False, indent=2)
+            )
+            logger.debug(f"Сохранено {len(data)} элементов в {self.file_path}")
+            self._signature = self._stat_signature()
         except Exception as e:
             logger.error(f"Ошибка сохранения в {self.file_path}: {e}")
+            raise
+
+    def snapshot(self, force_refresh: bool = False) -> Snapshot:
+        """Текущий срез без копирования; элементы изменять нельзя"""
+        if self._snapshot is None or self._changed(force=force_refresh):
+            self._reload()
+        return self._snapshot
+
+    def last_modified(self) -> Optional[float]:
+        """Время последнего изменения файлов хранилища (unix time)"""
+        times = [sig[0] for sig in self._stat_signature() if sig is not None]
+        return max(times) / 1e9 if times else None
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
 
     def get_all(self, force_refresh: bool = False) -> List:
-        if self._cache is None or force_refresh:
-            self._cache = self._load_file()
-        return self._cache.copy()
+        """Копия списка для изменения"""
+        return list(self.snapshot(force_refresh).items)
+
+    def _items_for_update(self) -> List:
+        """Состояние с диска для изменения; вызывается под блокировкой"""
+        items = self.get_all(force_refresh=True)
+        if self._load_failed:
+            raise StorageReadError(f"Не удалось прочитать {self.file_path}")
+        return items
+
+    @staticmethod
+    def _check_add(items: List, max_items: Optional[int]) -> None:
+        if max_items is not None and len(items) >= max_items:
+            raise StorageFullError(f"Уже {len(items)} элементов из {max_items}")
 
-    def add(self, item: str) -> None:
+    @staticmethod
+    def _check_delete(items: List, index: int, expected: Optional[str]) -> None:
+        if not 0 <= index < len(items):
+            raise ItemNotFoundError(f"Нет элемента с индексом {index}")
+        if expected is not None and items[index] != expected:
+            # Список сдвинулся после того, как клиент его увидел
+            raise ItemNotFoundError(f"По индексу {index} уже другой элемент")
+
+    def add(self, item: str, max_items: Optional[int] = None) -> None:
+        """Добавляет элемент; StorageFullError, если их уже max_items"""
         if not self.mutable:
             raise RuntimeError("Доступ только для чтения")
 
-        items = self.get_all()
-        items.append(item)
-        self._cache = items
-        self._save_file(items)
+        with self._locked():
+            items = self._items_for_update()
+            self._check_add(items, max_items)
+            items.append(item)
+            self._save_file(items)
+            self._publish(items)
 
-    def delete(self, index: int) -> None:
+    def delete(self, index: int, expected: Optional[str] = None) -> None:
+        """Удаляет элемент; ItemNotFoundError, если индекса нет или там не expected"""
         if not self.mutable:
             raise RuntimeError("Доступ только для чтения")
 
-        items = self.get_all()
-        if 0 <= index < len(items):
+        with self._locked():
+            items = self._items_for_update()
+            self._check_delete(items, index, expected)
             items.pop(index)
-            self._cache = items
             self._save_file(items)
+            self._publish(items)
 
     def clear_cache(self) -> None:
-        self._cache = None
+        self._snapshot = None
+        self._signature = None
+
+
+class JournalStorage(JsonStorage):
+    """Снимок в JSON плюс журнал изменений.
+
+    Изменение дописывается в журнал (файл.journal) одной строкой JSON
+    вместо перезаписи всего файла. Состояние — снимок с применённым
+    журналом; когда журнал превышает compact_bytes, фоновый поток
+    записывает новый снимок и начинает журнал заново.
+
+    Первая строка журнала хранит хэш снимка, поверх которого он ведётся.
+    Если сжатие прервалось между заменой снимка и обнулением журнала,
+    хэши не совпадут и журнал, уже вошедший в снимок, будет пропущен.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        fsync: str = NOTES_STORAGE["fsync"],
+        fsync_interval: float = NOTES_STORAGE["fsync_interval"],
+        compact_bytes: int = NOTES_STORAGE["compact_bytes"],
+    ):
+        super().__init__(file_path, mutable=True)
+        self.journal_path = file_path.with_name(file_path.name + ".journal")
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        # Журнал нужно начать заново или обрезать (делается только под блокировкой)
+        self._journal_stale = False
+        self._torn_at: Optional[int] = None
+        self._last_fsync = 0.0
+        self._compaction: Optional[threading.Thread] = None
+
+    def _paths(self) -> tuple:
+        # Другие процессы дописывают журнал, не трогая снимок
+        return (self.file_path, self.journal_path)
+
+    @staticmethod
+    def _digest(items: List) -> str:
+        data = json.dumps(items, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _apply(items: List, record: dict) -> None:
+        if record["op"] == "add":
+            items.append(record["item"])
+        elif record["op"] == "delete" and 0 <= record["index"] < len(items):
+            items.pop(record["index"])
+
+    def _read_journal(self) -> List[dict]:
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+
+        records, valid = [], 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+            valid += len(line)
+
+        # Оборванный хвост — упавшая запись (или чужая, ещё идущая):
+        # пропускаем, а обрежет его следующее изменение под блокировкой
+        self._torn_at = valid if valid < len(data) else None
+        return records
+
+    def _load_file(self) -> List:
+        with self._lock:
+            items = super()._load_file()
+            if self._load_failed:
+                # Без снимка журнал применять не к чему; изменения отклоняются
+                return items
+            self._journal_stale = not self.journal_path.exists()
+            if self._journal_stale:
+                return items
+
+            try:
+                records = self._read_journal()
+            except OSError as e:
+                logger.warning(f"Ошибка чтения {self.journal_path}: {e}")
+                self._load_failed = True
+                return []
+            if not records or records[0].get("digest") != self._digest(items):
+                # Журнал уже вошёл в снимок (или сжатие идёт прямо сейчас)
+                self._journal_stale = True
+                return items
+
+            for record in records[1:]:
+                self._apply(items, record)
+            logger.debug(f"Применено {len(records) - 1} записей журнала")
+            return items
+
+    def _fsync(self, f) -> None:
+        if self.fsync == "never":
+            return
+        now = time.monotonic()
+        if self.fsync == "always" or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(f.fileno())
+            self._last_fsync = now
+
+    def _compact(self, items: List) -> None:
+        # Сначала снимок, потом журнал: упавшее посередине сжатие
+        # распознаётся по хэшу в первой строке старого журнала
+        self._write_atomic(
+            self.file_path, json.dumps(items, ensure_ascii=False, indent=2)
+        )
+        base = {"op": "base", "digest": self._digest(items)}
+        self._write_atomic(self.journal_path, json.dumps(base) + "\n")
+        self._signature = self._stat_signature()
+        self._journal_stale = False
+        self._torn_at = None
+
+    def _append(self, record: dict) -> None:
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            self._fsync(f)
+            size = f.tell()
+        self._signature = self._stat_signature()
+        if size > self.compact_bytes:
+            self._start_compaction()
+
+    def _start_compaction(self) -> None:
+        if self._compaction is None or not self._compaction.is_alive():
+            self._compaction = threading.Thread(
+                target=self.compact, name="notes-compaction", daemon=True
+            )
+            self._compaction.start()
+
+    def compact(self) -> None:
+        """Записывает текущее состояние в снимок и обнуляет журнал"""
+        try:
+            with self._locked():
+                self._compact(self._items_for_update())
+            logger.info(f"🗜️ Журнал {self.journal_path.name} сжат")
+        except Exception as e:
+            logger.error(f"Ошибка сжатия {self.journal_path}: {e}")
+
+    def _mutate(self, items: List, record: dict) -> None:
+        if self._journal_stale:
+            # Журнала нет или он устарел: снимок должен совпасть с состоянием до записи
+            self._compact(items)
+        elif self._torn_at is not None:
+            logger.warning(f"Оборванная запись в {self.journal_path} отброшена")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(self._torn_at)
+            self._torn_at = None
+        self._append(record)
+        self._apply(items, record)
+        self._publish(items)
+
+    def add(self, item: str, max_items: Optional[int] = None) -> None:
+        with self._locked():
+            items = self._items_for_update()
+            self._check_add(items, max_items)
+            self._mutate(items, {"op": "add", "item": item})
+
+    def delete(self, index: int, expected: Optional[str] = None) -> None:
+        with self._locked():
+            items = self._items_for_update()
+            self._check_delete(items, index, expected)
+            self._mutate(items, {"op": "delete", "index": index})
 
 
-notes_storage = JsonStorage(NOTES_FILE, mutable=True)
+if NOTES_STORAGE["mode"] == "journal":
+    notes_storage = JournalStorage(NOTES_FILE)
+else:
+    notes_storage = JsonStorage(NOTES_FILE, mutable=True)
 quotes_storage = JsonStorage(QUOTE_FILE, mutable=False)
@@ -6,10 +6,11 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 NOTES_FILE = BASE_DIR / "data" / "notes.json"
 QUOTE_FILE = BASE_DIR / "data" / "quotes.json"
+# Скомпилированные цитаты для mmap, собираются из QUOTE_FILE
+QUOTE_STORE_FILE = BASE_DIR / "data" / "quotes.bin"
 STATIC_DIR = BASE_DIR / "static"
 TEMPLATES_DIR = BASE_DIR / "templates"
 SERVICE_DIR = BASE_DIR / "service"
-BASE_URL = "http://localhost:8000"
 
 # Координаты Москвы
 latitude = 55.75
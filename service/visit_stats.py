@@ -0,0 +1,323 @@
+"""
+Агрегаты посещений вместо подсчёта по всей таблице visit_log.
+
+При каждом визите обновляются почасовые строки visit_hourly и общий
+счётчик visit_counter. Уникальные IP считаются одним из двух способов
+(VISITS_UNIQUE["mode"]):
+
+- "hll" — IP попадает в HyperLogLog-скетч своего часа в памяти процесса;
+  скетчи периодически объединяются с сохранёнными в visit_hourly.ip_sketch,
+  сутки — объединение 24 почасовых скетчей;
+- "exact" — IP записывается в visit_hourly_ip, сутки — точный DISTINCT.
+
+При расхождении агрегаты пересобираются из visit_log, а оценку можно
+сверить с точным значением:
+
+    python -m service.visit_stats rebuild
+    python -m service.visit_stats compare
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.session import AsyncSessionLocal, async_engine
+from models.visit_stats import VisitCounter, VisitHourly, VisitHourlyIP
+from service.config import VISITS_UNIQUE
+from service.hll import HyperLogLog, precision_for_error
+
+logger = logging.getLogger(__name__)
+
+TOTAL_COUNTER = "total"
+
+REBUILD_SQL = (
+    "TRUNCATE visit_hourly, visit_hourly_ip",
+    """
+    INSERT INTO visit_hourly_ip (bucket, ip_address)
+    SELECT DISTINCT date_trunc('hour', visited_at, 'UTC'), coalesce(ip_address, '')
+    FROM visit_log
+    """,
+    """
+    INSERT INTO visit_hourly (bucket, visits, unique_ips)
+    SELECT date_trunc('hour', visited_at, 'UTC') AS bucket,
+           count(*),
+           count(DISTINCT coalesce(ip_address, ''))
+    FROM visit_log
+    GROUP BY bucket
+    """,
+    # Старые секции visit_log удаляются по сроку хранения, поэтому общий
+    # счётчик при пересборке не уменьшаем
+    f"""
+    INSERT INTO visit_counter (name, value)
+    SELECT '{TOTAL_COUNTER}', count(*) FROM visit_log
+    ON CONFLICT (name) DO UPDATE
+    SET value = greatest(visit_counter.value, excluded.value)
+    """,
+)
+
+EXACT_UNIQUE_SQL = """
+    SELECT count(DISTINCT coalesce(ip_address, ''))
+    FROM visit_log
+    WHERE visited_at >= :since
+    """
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(now: datetime | None = None) -> datetime:
+    """Первый час суточного окна: текущий час и 23 предыдущих"""
+    now = now or datetime.now(timezone.utc)
+    return hour_bucket(now) - timedelta(hours=23)
+
+
+class VisitSketches:
+    """Почасовые HyperLogLog-скетчи IP за последние сутки.
+
+    Скетч часа пополняется в памяти при каждом визите. flush раз в
+    flush_interval объединяет изменённые скетчи с сохранёнными в БД и
+    записывает результат, sync раз в sync_interval подтягивает скетчи
+    других процессов. Объединение прошедших часов кэшируется, так что
+    оценка на запрос — одно слияние с текущим часом.
+    """
+
+    def __init__(
+        self,
+        error: float = VISITS_UNIQUE["hll_error"],
+        sync_interval: float = VISITS_UNIQUE["sync_interval"],
+    ):
+        self.precision = precision_for_error(error)
+        self.sync_interval = sync_interval
+        self._sketches: dict[datetime, HyperLogLog] = {}
+        self._dirty: set[datetime] = set()
+        self._synced_at = float("-inf")
+        # Объединение часов до текущего: (текущий час, скетч)
+        self._past: tuple[datetime, HyperLogLog] | None = None
+
+    def _sketch(self, bucket: datetime) -> HyperLogLog:
+        sketch = self._sketches.get(bucket)
+        if sketch is None:
+            sketch = self._sketches[bucket] = HyperLogLog(self.precision)
+        return sketch
+
+    def _merge_stored(self, bucket: datetime, data: bytes) -> None:
+        stored = HyperLogLog.from_bytes(data)
+        if stored.precision != self.precision:
+            # Точность сменили в настройках — сохранённый скетч перезапишется
+            logger.warning(f"Скетч {bucket:%Y-%m-%d %H:00} другой точности, пропущен")
+            return
+        self._sketch(bucket).merge(stored)
+        if self._past and bucket < self._past[0]:
+            self._past = None
+
+    def add(self, bucket: datetime, ip_address: str) -> None:
+        if self._sketch(bucket).add(ip_address):
+            self._dirty.add(bucket)
+            if self._past and bucket < self._past[0]:
+                self._past = None
+
+    def prune(self, since: datetime) -> None:
+        """Забывает часы, вышедшие из окна и уже сохранённые"""
+        for bucket in [b for b in self._sketches if b < since]:
+            if bucket not in self._dirty:
+                del self._sketches[bucket]
+
+    def estimate(self, now: datetime | None = None) -> int:
+        current = hour_bucket(now or datetime.now(timezone.utc))
+        since = window_start(now)
+        self.prune(since)
+
+        if self._past is None or self._past[0] != current:
+            past = HyperLogLog(self.precision)
+            for bucket, sketch in self._sketches.items():
+                if since <= bucket < current:
+                    past.merge(sketch)
+            self._past = (current, past)
+
+        union = self._past[1]
+        if current in self._sketches:
+            union = union.copy().merge(self._sketches[current])
+        return union.count()
+
+    async def sync(self, db: AsyncSession) -> None:
+        """Объединяет локальные скетчи с сохранёнными за сутки"""
+        rows = await db.execute(
+            select(VisitHourly.bucket, VisitHourly.ip_sketch).where(
+                VisitHourly.bucket >= window_start(),
+                VisitHourly.ip_sketch.is_not(None),
+            )
+        )
+        for bucket, data in rows:
+            self._merge_stored(bucket, data)
+        self._synced_at = time.monotonic()
+
+    async def count_unique(self, db: AsyncSession) -> int:
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            await self.sync(db)
+        return self.estimate()
+
+    async def save(self, db: AsyncSession) -> int:
+        """Записывает изменённые скетчи, объединив их с уже сохранёнными"""
+        dirty, self._dirty = self._dirty, set()
+        try:
+            for bucket in sorted(dirty):
+                stored = await db.scalar(
+                    select(VisitHourly.ip_sketch)
+                    .where(VisitHourly.bucket == bucket)
+                    .with_for_update()
+                )
+                if stored:
+                    self._merge_stored(bucket, stored)
+                sketch = self._sketches[bucket]
+                row = insert(VisitHourly).values(
+                    bucket=bucket,
+                    visits=0,
+                    unique_ips=sketch.count(),
+                    ip_sketch=sketch.to_bytes(),
+                )
+                await db.execute(
+                    row.on_conflict_do_update(
+                        index_elements=[VisitHourly.bucket],
+                        set_={
+                            "unique_ips": row.excluded.unique_ips,
+                            "ip_sketch": row.excluded.ip_sketch,
+                        },
+                    )
+                )
+            await db.commit()
+        except Exception:
+            # Не записанные скетчи сохраним в следующий раз
+            self._dirty |= dirty
+            raise
+        return len(dirty)
+
+    async def flush(self) -> int:
+        """Сохранение в отдельной сессии (для планировщика и остановки)"""
+        if not self._dirty:
+            return 0
+        async with AsyncSessionLocal() as db:
+            return await self.save(db)
+
+
+visit_sketches = VisitSketches()
+
+
+async def record_visit(
+    db: AsyncSession, ip_address: str | None, visited_at: datetime | None = None
+) -> None:
+    """Учитывает визит в агрегатах; коммит остаётся за вызывающим"""
+    bucket = hour_bucket(visited_at or datetime.now(timezone.utc))
+
+    if VISITS_UNIQUE["mode"] == "hll":
+        # unique_ips часа записывает VisitSketches.save по скетчу
+        visit_sketches.add(bucket, ip_address or "")
+        is_new = 0
+    else:
+        new_ip = await db.scalar(
+            insert(VisitHourlyIP)
+            .values(bucket=bucket, ip_address=ip_address or "")
+            .on_conflict_do_nothing()
+            .returning(VisitHourlyIP.bucket)
+        )
+        is_new = 1 if new_ip is not None else 0
+
+    hourly = insert(VisitHourly).values(bucket=bucket, visits=1, unique_ips=is_new)
+    await db.execute(
+        hourly.on_conflict_do_update(
+            index_elements=[VisitHourly.bucket],
+            set_={
+                "visits": VisitHourly.visits + 1,
+                "unique_ips": VisitHourly.unique_ips + is_new,
+            },
+        )
+    )
+
+    counter = insert(VisitCounter).values(name=TOTAL_COUNTER, value=1)
+    await db.execute(
+        counter.on_conflict_do_update(
+            index_elements=[VisitCounter.name],
+            set_={"value": VisitCounter.value + 1},
+        )
+    )
+
+
+async def read_visit_stats(db: AsyncSession) -> dict:
+    """Общее число, визиты и уникальные IP за последние 24 часовых интервала"""
+    since = window_start()
+
+    total = await db.scalar(
+        select(VisitCounter.value).where(VisitCounter.name == TOTAL_COUNTER)
+    )
+    last_24h = await db.scalar(
+        select(func.coalesce(func.sum(VisitHourly.visits), 0)).where(
+            VisitHourly.bucket >= since
+        )
+    )
+    if VISITS_UNIQUE["mode"] == "hll":
+        unique = await visit_sketches.count_unique(db)
+    else:
+        unique = await db.scalar(
+            select(func.count(func.distinct(VisitHourlyIP.ip_address))).where(
+                VisitHourlyIP.bucket >= since
+            )
+        )
+    return {
+        "total": total or 0,
+        "last_24h": last_24h or 0,
+        "unique_last_24h": unique or 0,
+    }
+
+
+async def rebuild_visit_rollups(db: AsyncSession) -> None:
+    """Пересобирает все агрегаты из сырых записей visit_log"""
+    for statement in REBUILD_SQL:
+        await db.execute(text(statement))
+
+    if VISITS_UNIQUE["mode"] == "hll":
+        # Скетчи нужны только за сутки; список IP в этом режиме не ведётся
+        sketches = VisitSketches()
+        rows = await db.stream(
+            select(VisitHourlyIP.bucket, VisitHourlyIP.ip_address).where(
+                VisitHourlyIP.bucket >= window_start()
+            )
+        )
+        async for bucket, ip_address in rows:
+            sketches.add(bucket, ip_address)
+        await db.execute(text("TRUNCATE visit_hourly_ip"))
+        await sketches.save(db)
+    await db.commit()
+    logger.info("Агрегаты посещений пересобраны из visit_log")
+
+
+async def compare_unique(db: AsyncSession) -> dict:
+    """Точное число уникальных IP за сутки по visit_log и оценка по скетчам"""
+    exact = await db.scalar(text(EXACT_UNIQUE_SQL), {"since": window_start()})
+    sketches = VisitSketches()
+    await sketches.sync(db)
+    estimate = sketches.estimate()
+    error = abs(estimate - exact) / exact if exact else 0.0
+    return {"exact": exact, "estimate": estimate, "error": round(error, 4)}
+
+
+async def _main(command: str) -> None:
+    if command not in ("rebuild", "compare"):
+        raise SystemExit(
+            "Использование: python -m service.visit_stats rebuild | compare"
+        )
+    async with AsyncSessionLocal() as db:
+        if command == "rebuild":
+            await rebuild_visit_rollups(db)
+        else:
+            print(await compare_unique(db))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else ""))
@@ -1,9 +1,20 @@
 # tests/test_cache.py
+import json
+
 import pytest
+from fastapi.encoders import jsonable_encoder
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
 
-from service.cache import delete_cached, get_cached, set_cached, ttl_logic
+from app.weather import CurrentWeather
+from service.cache import (
+    delete_cached,
+    entry_response,
+    get_cached,
+    make_entry,
+    set_cached,
+    ttl_logic,
+)
 
 
 # 1. Проверка записи и чтения из кэша через set_cached и get_cached
@@ -79,3 +90,27 @@ async def test_delete_cached_fallback(monkeypatch):
     await delete_cached("x")
     value = await get_cached("x")
     assert value is None or value == {}  # зависит от того, как backend возвращает None
+
+
+# 9. Запись кэша хранит готовое тело; модели pydantic кодируются как в FastAPI
+def test_make_entry_body():
+    data = {
+        "weather": CurrentWeather(
+            temperature=1.5,
+            windspeed=3.0,
+            wind_direction="С",
+            weather_text="Ясно",
+            is_day=1,
+            moscow_time="12:00",
+        ),
+        "quotes": ("Ёж", 2),
+    }
+    entry = make_entry(data, ttl=60)
+
+    assert json.loads(entry["body"]) == {
+        "weather": jsonable_encoder(data["weather"]),
+        "quotes": ["Ёж", 2],
+    }
+    response = entry_response(entry)
+    assert response.body == entry["body"]
+    assert response.media_type == "application/json"
@@ -0,0 +1,231 @@
+# tests/test_cache_backend.py
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+import pytest_asyncio
+
+from service.cache import make_entry
+from service.cache_backend import BoundedMemoryBackend, TieredBackend, entry_size
+
+
+def entry(size: int) -> dict:
+    return {"data": None, "body": b"x" * size}
+
+
+# 1. При превышении числа записей вытесняется давно не читанная
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    backend = BoundedMemoryBackend(max_entries=2, max_bytes=1000, quotas={})
+    await backend.set("a", entry(1), expire=60)
+    await backend.set("b", entry(1), expire=60)
+    assert await backend.get("a")  # "a" теперь свежее "b"
+    await backend.set("c", entry(1), expire=60)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") and await backend.get("c")
+    assert backend.stats["evictions"] == {"": 1}
+
+
+# 2. Предел по байтам считается по памяти записи
+@pytest.mark.asyncio
+async def test_bytes_limit():
+    size = entry_size(entry(40))
+    backend = BoundedMemoryBackend(max_entries=100, max_bytes=2 * size, quotas={})
+    for key in "abc":
+        await backend.set(key, entry(40), expire=60)
+
+    assert backend.stats["entries"] == 2
+    assert backend.bytes == 2 * size
+    await backend.set("big", entry(2 * size), expire=60)
+    assert await backend.get("big") is None
+
+
+# 3. В размер входят и тело ответа, и разобранные данные
+def test_entry_size_counts_data():
+    data = {"quotes": [{"ID": i, "text": "x" * 100} for i in range(100)]}
+    cached = make_entry(data, ttl=60)
+
+    assert entry_size(cached) > len(cached["body"]) + 100 * 100
+    assert entry_size(cached) > 2 * len(cached["body"])
+
+
+# 4. Квота семейства вытесняет только записи этого семейства
+@pytest.mark.asyncio
+async def test_family_quota():
+    backend = BoundedMemoryBackend(
+        max_entries=100, max_bytes=10_000, quotas={"quote_": 3}
+    )
+    await backend.set("quotes", entry(10), expire=60)
+    for i in range(10):
+        await backend.set(f"quote_{i}", entry(10), expire=60)
+
+    assert await backend.get("quotes")
+    assert [i for i in range(10) if await backend.get(f"quote_{i}")] == [7, 8, 9]
+    assert backend.evictions["quote_"] == 7
+
+
+# 5. Просроченная запись не отдаётся, clear удаляет по префиксу
+@pytest.mark.asyncio
+async def test_expire_and_clear(mocker):
+    backend = BoundedMemoryBackend(quotas={})
+    await backend.set("notes", entry(1), expire=10)
+    await backend.set("notes_extra", entry(1), expire=10)
+    await backend.set("weather", entry(1), expire=10)
+
+    assert await backend.clear("notes") == 2
+    assert (await backend.get_with_ttl("weather"))[0] in (9, 10)
+
+    mocker.patch("service.cache_backend.time.time", return_value=time.time() + 11)
+    assert await backend.get("weather") is None
+    assert backend.bytes == 0
+
+
+class FakeRedis:
+    """Замена Redis для тестов: общие ключи и pub/sub между клиентами"""
+
+    def __init__(self, store=None, subscribers=None):
+        self.store = {} if store is None else store
+        self.subscribers = [] if subscribers is None else subscribers
+        self.calls = Counter()
+
+    def client(self) -> "FakeRedis":
+        # Отдельное подключение другого воркера к тому же серверу
+        return FakeRedis(self.store, self.subscribers)
+
+    async def get(self, key):
+        self.calls["get"] += 1
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.store)
+
+    async def eval(self, script, numkeys, key, token):
+        # Только снятие аренды: удалить ключ, если значение совпадает
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+    async def rpush(self, key, *values):
+        self.store.setdefault(key, []).extend(values)
+        return len(self.store[key])
+
+    async def lpop(self, key, count):
+        values = self.store.get(key) or []
+        popped, self.store[key] = values[:count], values[count:]
+        return popped or None
+
+    async def delete(self, *keys):
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+    async def scan_iter(self, match):
+        for key in list(self.store):
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "message", "data": message})
+
+    def pubsub(self):
+        return FakePubSub(self.subscribers)
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, subscribers):
+        self.subscribers = subscribers
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.subscribers.append(self.queue)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        if self.queue in self.subscribers:
+            self.subscribers.remove(self.queue)
+
+
+class DeadPubSub(FakePubSub):
+    """Подписка на недоступный Redis: соединение отклоняется"""
+
+    attempts = 0
+
+    async def subscribe(self, channel):
+        DeadPubSub.attempts += 1
+        raise ConnectionError("Connection refused")
+
+
+# Подписки должны слушать в цикле событий самого теста
+@pytest_asyncio.fixture(loop_scope="function")
+async def workers():
+    server = FakeRedis()
+    backends = [TieredBackend(server.client(), prefix="t:") for _ in range(2)]
+    for backend in backends:
+        await backend.start()
+    await asyncio.sleep(0)  # подписки оформлены
+    yield backends
+    for backend in backends:
+        await backend.close()
+
+
+# 6. Запись одного воркера читается другим из L2 и остаётся в его L1
+@pytest.mark.asyncio
+async def test_tiered_shares_entries(workers):
+    first, second = workers
+    entry = make_entry({"weather": {"temperature": 1}}, ttl=60)
+    await first.set("weather_cache", entry, expire=90)
+
+    value = await second.get("weather_cache")
+    assert value["data"] == {"weather": {"temperature": 1}}
+    assert value["body"] == entry["body"] and value["etag"] == entry["etag"]
+    assert 88 <= (await second.l1.get_with_ttl("weather_cache"))[0] <= 90
+
+    await second.get("weather_cache")
+    assert second.redis.calls["get"] == 1
+    assert second.l2_hits == 1
+
+
+# 7. delete_cached в одном воркере сбрасывает L1 всех воркеров
+@pytest.mark.asyncio
+async def test_tiered_invalidation(workers):
+    first, second = workers
+    await first.set("notes", make_entry({"notes": ["a"]}, ttl=60), expire=60)
+    assert await second.get("notes")
+
+    await first.clear("notes")
+    await asyncio.sleep(0.01)
+
+    assert await second.l1.get("notes") is None
+    assert await second.get("notes") is None
+    assert second.invalidations == 2  # запись и удаление
+    assert first.invalidations == 0
+
+
+# 8. Без Redis кэш работает на L1
+@pytest.mark.asyncio
+async def test_tiered_redis_down(mocker):
+    redis = FakeRedis()
+    mocker.patch.object(redis, "get", side_effect=ConnectionError("down"))
+    mocker.patch.object(redis, "set", side_effect=ConnectionError("down"))
+    backend = TieredBackend(redis)
+
+    await backend.set("quotes", make_entry({"quotes": []}, ttl=60), expire=60)
+    assert await backend.get("quotes")
+    assert await backend.get("weather_cache") is None
+    assert backend.l2_errors == 2
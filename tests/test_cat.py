@@ -1,10 +1,35 @@
 # tests/test_cat.py
+import asyncio
+
+import httpx
 import pytest
 import respx
 from httpx import Response
 
+from app.cat import CatPool, cat_pool
 from service.variables import CAT_FALLBACK
 
+CAT_API = "https://api.thecatapi.com/v1/images/search"
+
+
+def cats_json(count, prefix="cat"):
+    return [
+        {
+            "id": f"{prefix}{i}",
+            "url": f"https://cdn.fakecat.com/{prefix}{i}.jpg",
+            "width": 1,
+            "height": 1,
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def empty_pool():
+    cat_pool.clear()
+    yield cat_pool
+    cat_pool.clear()
+
 
 # 1. Успешный случай с моками
 @respx.mock
@@ -31,6 +56,9 @@ async def test_api_cat_success(client):
     assert api_mock.called, "API не был вызван!"
     assert response.status_code == 200
     assert data["cat"]["url"] == mock_url
+    # Каждый запрос — новый кот, общий кэш его не закрепляет
+    assert "x-accel-expires" not in response.headers
+    assert "cache-control" not in response.headers
 
 
 # 2. Проверка локального fallback-файла
@@ -56,6 +84,60 @@ async def test_api_cat_fallback_on_error(client):
     assert response.status_code == 200
     assert data["cat"] == CAT_FALLBACK
     assert data["status"] == "fallback"
+    assert "x-accel-expires" not in response.headers
+
+
+# 4. Один запрос к API обслуживает несколько котов подряд
+@respx.mock
+@pytest.mark.asyncio
+async def test_api_cat_served_from_pool(client, empty_pool):
+    api_mock = respx.get(CAT_API).mock(return_value=Response(200, json=cats_json(10)))
+
+    urls = [(await client.get("/api/cat")).json()["cat"]["url"] for _ in range(4)]
+
+    assert api_mock.call_count == 1
+    assert api_mock.calls[0].request.url.params["limit"] == str(empty_pool.batch_size)
+    assert len(set(urls)) == 4
+
+
+# 5. Ниже low_water запас пополняется в фоне
+@respx.mock
+@pytest.mark.asyncio
+async def test_cat_pool_refills_below_low_water():
+    respx.get(CAT_API).mock(
+        side_effect=[
+            Response(200, json=cats_json(3, "a")),
+            Response(200, json=cats_json(3, "b")),
+        ]
+    )
+    pool = CatPool(batch_size=3, capacity=10, low_water=2)
+    async with httpx.AsyncClient() as http:
+        first = await pool.get(http)
+        second = await pool.get(http)  # остался 1 < low_water
+        await pool._refill_task
+
+        assert first.id == "a0" and second.id == "a1"
+        assert len(pool) == 4
+        assert pool.upstream_calls == 2
+
+
+# 6. Параллельные промахи делают одну выборку, при отказе API отдаём последнего
+@respx.mock
+@pytest.mark.asyncio
+async def test_cat_pool_single_refill_and_last_cat():
+    api_mock = respx.get(CAT_API).mock(
+        side_effect=[Response(200, json=cats_json(2)), Response(500), Response(500)]
+    )
+    pool = CatPool(batch_size=2, capacity=10, low_water=0)
+    async with httpx.AsyncClient() as http:
+        cats = await asyncio.gather(pool.get(http), pool.get(http))
+        assert {c.id for c in cats} == {"cat0", "cat1"}
+        assert api_mock.call_count == 1
+
+        # Буфер пуст, API отвечает ошибкой — повторяем последнего кота
+        last = await pool.get(http)
+        assert last is not None and last.id in {"cat0", "cat1"}
+        assert api_mock.call_count == 2
 
 
 # Пример использования времени жизни кэша для тестов
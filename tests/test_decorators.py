@@ -0,0 +1,207 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+from service.cache import get_cached, set_cached
+from service.decorators import cached_route, coalesced_calls
+
+
+@pytest.fixture
+def cache():
+    FastAPICache.init(InMemoryBackend())
+    InMemoryBackend._store.clear()  # хранилище общее для всех экземпляров
+    coalesced_calls.clear()
+
+
+# 1. Конкурентные промахи кэша вызывают источник один раз
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_misses(cache):
+    calls = 0
+
+    @cached_route("test_single_flight", source="weather")
+    async def load(nocache: bool = False):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"current_weather": {"temperature": calls}}
+
+    results = await asyncio.gather(*(load() for _ in range(10)))
+
+    assert calls == 1
+    assert all(r == {"current_weather": {"temperature": 1}} for r in results)
+    assert coalesced_calls["test_single_flight"] == 9
+
+
+# 2. Fallback тоже общий для всех ожидающих
+@pytest.mark.asyncio
+async def test_single_flight_shares_fallback(cache):
+    calls = 0
+
+    @cached_route("test_fallback", fallback_data={"fallback": "yes"})
+    async def load(nocache: bool = False):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return None
+
+    results = await asyncio.gather(*(load() for _ in range(5)))
+
+    assert calls == 1
+    assert results == [{"fallback": "yes"}] * 5
+
+
+# 3. Исключение передаётся всем ожидающим, следующий вызов идёт заново
+@pytest.mark.asyncio
+async def test_single_flight_shares_exception(cache):
+    calls = 0
+
+    @cached_route("test_error")
+    async def load(nocache: bool = False):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream")
+
+    results = await asyncio.gather(*(load() for _ in range(3)), return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+
+    with pytest.raises(ValueError):
+        await load()
+    assert calls == 2
+
+
+# 4. nocache не объединяется с другими вызовами
+@pytest.mark.asyncio
+async def test_nocache_bypasses_single_flight(cache):
+    calls = 0
+
+    @cached_route("test_nocache", source="weather")
+    async def load(nocache: bool = False):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"current_weather": {}}
+
+    await asyncio.gather(*(load(nocache=True) for _ in range(3)))
+    assert calls == 3
+    assert coalesced_calls["test_nocache"] == 0
+
+
+async def put_stale(key, data, seconds_ago, ok=True):
+    entry = {"data": data, "expires_at": time.time() - seconds_ago, "ok": ok}
+    await set_cached(key, entry, ttl=3600)
+
+
+# 5. stale-while-revalidate: отдаём старое сразу и обновляем в фоне один раз
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(cache):
+    calls = 0
+
+    @cached_route("test_swr", source="weather", stale_while_revalidate=60)
+    async def load(nocache: bool = False):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"current_weather": {"temperature": 2}}
+
+    await put_stale("test_swr", {"current_weather": {"temperature": 1}}, 10)
+
+    results = await asyncio.gather(*(load() for _ in range(5)))
+    assert results == [{"current_weather": {"temperature": 1}}] * 5
+
+    await asyncio.sleep(0.1)
+    assert calls == 1
+    assert (await get_cached("test_swr"))["data"] == {
+        "current_weather": {"temperature": 2}
+    }
+    assert await load() == {"current_weather": {"temperature": 2}}
+
+
+# 6. stale-if-error: при fallback источника отдаём последнее удачное значение
+@pytest.mark.asyncio
+async def test_stale_if_error_on_fallback(cache):
+    @cached_route("test_sie", source="weather", stale_if_error=600)
+    async def load(nocache: bool = False):
+        return {"weather": "fallback", "status": "fallback"}
+
+    good = {"weather": "ok", "status": "success"}
+    await put_stale("test_sie", good, 100)
+
+    assert await load() == good
+    # nocache получает ответ источника, но удачное значение в кэше остаётся
+    assert await load(nocache=True) == {"weather": "fallback", "status": "fallback"}
+    assert (await get_cached("test_sie"))["data"] == good
+
+
+# 7. stale-if-error: при исключении источника тоже отдаём кэш
+@pytest.mark.asyncio
+async def test_stale_if_error_on_exception(cache):
+    @cached_route("test_sie_exc", source="weather", stale_if_error=600)
+    async def load(nocache: bool = False):
+        raise RuntimeError("upstream")
+
+    good = {"weather": "ok", "status": "success"}
+    await put_stale("test_sie_exc", good, 100)
+
+    assert await load() == good
+
+
+# 8. За пределами окна stale-if-error работает обычный fallback
+@pytest.mark.asyncio
+async def test_stale_if_error_window_expired(cache):
+    fallback = {"weather": "fallback", "status": "fallback"}
+
+    @cached_route("test_sie_old", source="weather", stale_if_error=60)
+    async def load(nocache: bool = False):
+        return fallback
+
+    await put_stale("test_sie_old", {"weather": "ok", "status": "success"}, 100)
+
+    assert await load() == fallback
+
+
+# 9. as_response: попадание в кэш отдаёт сохранённое тело без повторного кодирования
+@pytest.mark.asyncio
+async def test_as_response_reuses_body(cache, mocker):
+    @cached_route("test_body", source="weather")
+    async def load(nocache: bool = False):
+        return {"current_weather": {"temperature": 1}}
+
+    first = await load(as_response=True)
+    encode = mocker.patch("service.cache.encode_json")
+    second = await load(as_response=True)
+
+    encode.assert_not_called()
+    assert second.body == first.body == (await get_cached("test_body"))["body"]
+    assert json.loads(second.body) == await load()
+
+
+# 10. public: общий кэш хранит ответ до конца TTL, fallback не хранит
+@pytest.mark.asyncio
+async def test_public_cache_headers(cache):
+    status = "success"
+
+    @cached_route(
+        "test_public", ttl=900, public=True, stale_while_revalidate=30, source="weather"
+    )
+    async def load(nocache: bool = False):
+        return {"current_weather": {"temperature": 1}, "status": status}
+
+    response = await load(as_response=True)
+    max_age = int(response.headers["x-accel-expires"])
+    assert 0 < max_age <= 900
+    assert response.headers["cache-control"] == (
+        f"public, max-age=0, s-maxage={max_age}, stale-while-revalidate=30"
+    )
+    assert list(response.headers).index("cache-control") < list(response.headers).index(
+        "x-accel-expires"
+    )
+
+    status = "fallback"
+    response = await load(nocache=True, as_response=True)
+    assert response.headers["cache-control"] == "no-cache"
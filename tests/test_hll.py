@@ -0,0 +1,57 @@
+import pytest
+
+from service.hll import HyperLogLog, precision_for_error
+
+
+# 1. Точность выбирается по допустимой ошибке
+def test_precision_for_error():
+    assert precision_for_error(0.01) == 14
+    assert precision_for_error(0.02) == 12
+    assert HyperLogLog(precision_for_error(0.02)).error <= 0.02
+    # Границы точности
+    assert precision_for_error(0.5) == 4
+    assert precision_for_error(0.0001) == 16
+
+
+# 2. Оценка укладывается в три стандартные ошибки
+@pytest.mark.parametrize("n", [10, 1000, 50000])
+def test_count_accuracy(n):
+    sketch = HyperLogLog(12)
+    for i in range(n):
+        sketch.add(f"192.168.{i // 256}.{i % 256}-{i}")
+        # Повторы не меняют оценку
+        sketch.add(f"192.168.{i // 256}.{i % 256}-{i}")
+
+    assert abs(sketch.count() - n) <= max(3 * sketch.error * n, 1)
+
+
+# 3. Объединение скетчей — оценка объединения множеств
+def test_merge():
+    first, second = HyperLogLog(12), HyperLogLog(12)
+    for i in range(3000):
+        first.add(str(i))
+    for i in range(2000, 5000):
+        second.add(str(i))
+
+    union = first.copy().merge(second)
+
+    assert abs(union.count() - 5000) <= 3 * union.error * 5000
+    assert abs(first.count() - 3000) <= 3 * first.error * 3000
+    with pytest.raises(ValueError):
+        first.merge(HyperLogLog(10))
+
+
+# 4. Скетч сохраняется в байты и восстанавливается без потерь
+def test_bytes_roundtrip():
+    sketch = HyperLogLog(10)
+    for i in range(500):
+        sketch.add(str(i))
+
+    data = sketch.to_bytes()
+    restored = HyperLogLog.from_bytes(data)
+
+    assert len(data) == 1024
+    assert restored.precision == 10
+    assert restored.count() == sketch.count()
+    with pytest.raises(ValueError):
+        HyperLogLog(10, b"\0" * 100)
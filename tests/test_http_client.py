@@ -0,0 +1,42 @@
+import httpx
+import pytest
+
+from service import http_client
+from service.config import HTTP_CLIENT
+
+
+# 1. До инициализации клиент недоступен
+def test_get_http_client_not_initialized(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+    with pytest.raises(RuntimeError, match="не инициализирован"):
+        http_client.get_http_client()
+
+
+# 2. Клиент создаётся один раз и закрывается при остановке
+@pytest.mark.asyncio
+async def test_init_and_close_http_client(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+
+    client = await http_client.init_http_client()
+    assert await http_client.init_http_client() is client
+    assert http_client.get_http_client() is client
+
+    await http_client.close_http_client()
+    assert client.is_closed
+    with pytest.raises(RuntimeError):
+        http_client.get_http_client()
+
+
+# 3. Таймауты берутся из настроек
+@pytest.mark.asyncio
+async def test_http_client_timeouts():
+    client = http_client.create_http_client()
+    assert client.timeout.connect == HTTP_CLIENT["connect_timeout"]
+    assert client.timeout.read == HTTP_CLIENT["read_timeout"]
+    await client.aclose()
+
+
+# 4. Приложение использует общий клиент из lifespan
+@pytest.mark.asyncio
+async def test_lifespan_initializes_client(client):
+    assert isinstance(http_client.get_http_client(), httpx.AsyncClient)
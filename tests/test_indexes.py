@@ -0,0 +1,139 @@
+"""
+Проверка планов запросов, которые выполняет приложение, через EXPLAIN.
+
+Нужен доступный PostgreSQL (переменные POSTGRES_*), иначе тесты
+пропускаются. Запросы не переписываются вручную: read_visit_stats
+выполняется с сессией, записывающей операторы, и они же идут в EXPLAIN.
+Таблицы создаются по моделям во временной схеме, заполняются
+синтетическими данными и удаляются после тестов.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from db.base import Base
+from db.session import engine
+from models.api_log import APILog
+from models.visit_log import VisitLog
+from models.visit_stats import VisitCounter, VisitHourly, VisitHourlyIP
+from service.config import VISITS_UNIQUE
+from service.visit_stats import VisitSketches, read_visit_stats
+
+SCHEMA = "explain_test"
+HOURS = 365 * 24
+IPS_PER_HOUR = 50
+ROLLUP_TABLES = {"visit_hourly", "visit_hourly_ip"}
+
+HOURLY_SQL = """
+    INSERT INTO visit_hourly (bucket, visits, unique_ips)
+    SELECT date_trunc('hour', now()) - interval '1 hour' * g, 10, 5
+    FROM generate_series(0, :hours - 1) AS g
+    """
+HOURLY_IP_SQL = """
+    INSERT INTO visit_hourly_ip (bucket, ip_address)
+    SELECT date_trunc('hour', now()) - interval '1 hour' * (g / :ips),
+           '10.0.0.' || (g % :ips)
+    FROM generate_series(0, :hours * :ips - 1) AS g
+    """
+
+
+class StatementRecorder:
+    """Сессия-заглушка: запоминает операторы вместо выполнения"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def scalar(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return None
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return []
+
+
+def live_statements(mocker, mode: str) -> list:
+    """Операторы, которые read_visit_stats выполняет в режиме mode"""
+    mocker.patch.dict(VISITS_UNIQUE, mode=mode)
+    mocker.patch("service.visit_stats.visit_sketches", VisitSketches())
+    db = StatementRecorder()
+    asyncio.run(read_visit_stats(db))
+    return db.statements
+
+
+def plan_nodes(conn, statement) -> list[dict]:
+    """Все узлы плана оператора"""
+    compiled = statement.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    nodes = []
+
+    def walk(node):
+        nodes.append(node)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return nodes
+
+
+@pytest.fixture(scope="module")
+def pg():
+    try:
+        conn = engine.connect()
+        conn.execute(text("SELECT 1"))
+    except OperationalError:
+        pytest.skip("PostgreSQL недоступен")
+    conn.commit()
+    conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        tables = [VisitLog, APILog, VisitHourly, VisitHourlyIP, VisitCounter]
+        Base.metadata.create_all(conn, tables=[t.__table__ for t in tables])
+        conn.execute(text(HOURLY_SQL), {"hours": HOURS})
+        conn.execute(text(HOURLY_IP_SQL), {"hours": HOURS, "ips": IPS_PER_HOUR})
+        conn.execute(text("INSERT INTO visit_counter VALUES ('total', 1000000)"))
+        # Карта видимости нужна для Index Only Scan, статистика — планировщику
+        for table in ("visit_hourly", "visit_hourly_ip", "visit_counter"):
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+        yield conn
+    finally:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        conn.close()
+
+
+# 1. Статистика посещений в обоих режимах читает сутки агрегатов по первичному ключу
+@pytest.mark.parametrize("mode", ["exact", "hll"])
+def test_visit_stats_use_primary_keys(pg, mocker, mode):
+    statements = live_statements(mocker, mode)
+    assert statements
+
+    for statement in statements:
+        for node in plan_nodes(pg, statement):
+            if node.get("Relation Name") in ROLLUP_TABLES:
+                assert node["Node Type"] != "Seq Scan", str(statement)
+            if "Index Name" in node:
+                assert node["Index Name"].endswith("_pkey")
+
+
+# 2. Журналы только пишутся: кроме ключа и индекса id, вставки ничего не обновляют
+def test_log_tables_have_no_secondary_indexes(pg):
+    indexes = pg.execute(
+        text("""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = :schema AND tablename IN ('visit_log', 'api_log')
+            """),
+        {"schema": SCHEMA},
+    ).scalars()
+
+    assert set(indexes) == {
+        "visit_log_pkey",
+        "ix_visit_log_id",
+        "api_log_pkey",
+        "ix_api_log_id",
+    }
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from service.logging_utils import APILogWriter
+
+
+def record(i):
+    return {"method": "GET", "path": f"/api/{i}", "status_code": 200}
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    def _make(**kwargs):
+        w = APILogWriter(**kwargs)
+        w.batches = []
+
+        async def write(batch):
+            w.batches.append(batch)
+
+        monkeypatch.setattr(w, "_write_batch", write)
+        return w
+
+    return _make
+
+
+# 1. Пачка уходит одним INSERT, как только набралась batch_size
+@pytest.mark.asyncio
+async def test_flush_on_batch_size(writer):
+    w = writer(batch_size=3, flush_interval=10)
+    await w.start()
+    for i in range(6):
+        w.submit(record(i))
+    await asyncio.sleep(0.05)
+
+    assert [len(b) for b in w.batches] == [3, 3]
+    await w.stop()
+
+
+# 2. Неполная пачка уходит по таймеру
+@pytest.mark.asyncio
+async def test_flush_on_interval(writer):
+    w = writer(batch_size=100, flush_interval=0.05)
+    await w.start()
+    w.submit(record(1))
+    await asyncio.sleep(0.15)
+
+    assert w.batches == [[record(1)]]
+    await w.stop()
+
+
+# 3. При переполнении очереди записи отбрасываются и считаются
+@pytest.mark.asyncio
+async def test_overflow_drops_records(writer):
+    w = writer(max_size=2, batch_size=100, flush_interval=10)
+    await w.start()
+    results = [w.submit(record(i)) for i in range(5)]
+
+    assert results == [True, True, False, False, False]
+    assert w.stats["dropped"] == 3
+    assert w.stats["queue_depth"] == 2
+    await w.stop()
+
+
+# 4. stop сбрасывает остаток очереди
+@pytest.mark.asyncio
+async def test_stop_flushes_queue(writer):
+    w = writer(batch_size=2, flush_interval=10)
+    await w.start()
+    for i in range(5):
+        w.submit(record(i))
+    await w.stop()
+
+    assert sum(len(b) for b in w.batches) == 5
+    assert w.stats == {"queue_depth": 0, "written": 5, "dropped": 0, "failed": 0}
+    assert w.submit(record(6)) is False
+
+
+# 5. Ошибка БД не останавливает запись
+@pytest.mark.asyncio
+async def test_write_error_counted(monkeypatch):
+    w = APILogWriter(batch_size=1, flush_interval=10)
+
+    async def broken(batch):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(w, "_write_batch", broken)
+    await w.start()
+    w.submit(record(1))
+    w.submit(record(2))
+    await w.stop()
+
+    assert w.failed == 2
@@ -1,36 +1,30 @@
 # tests/test_main.py
-import httpx
 import pytest
 import respx
-from httpx import Response
 
-from main import fetch_data
+from service.variables import CAT_FALLBACK, WEATHER_FALLBACK
 
 
-# 1. Проверка моками роутов на главной странице
-@respx.mock
-@pytest.mark.asyncio
-async def test_index_route(client, mocker):
+# Данные сервисов для главной страницы
+@pytest.fixture
+def mock_services(mocker):
     mocker.patch("main.log_visit")  # Мокируем функцию которая обращается к базе данных
-    respx.get("/api/weather").mock(
-        return_value=Response(
-            200, json={"weather": {"current_weather": {"weather_text": "Пасмурно"}}}
-        )
-    )
-    respx.get("/api/cat").mock(
-        return_value=Response(200, json={"cat": {"url": "https://kotik.jpg"}})
+    mocker.patch(
+        "main.load_weather",
+        return_value={"weather": {"current_weather": {"weather_text": "Пасмурно"}}},
     )
-    respx.get("/api/quotes/random").mock(
-        return_value=Response(200, json={"quotes": {"text": "AUF"}})
-    )
-    respx.get("/api/notes").mock(
-        return_value=Response(200, json={"notes": ["заметка1", "заметка2"]})
-    )
-    respx.get("/api/visits").mock(
-        return_value=Response(
-            200, json={"visits": {"total": 5, "last_24h": 2, "unique": 3}}
-        )
+    mocker.patch("main.load_cat", return_value={"cat": {"url": "https://kotik.jpg"}})
+    mocker.patch("main.load_random_quote", return_value={"quotes": {"text": "AUF"}})
+    mocker.patch("main.load_notes", return_value={"notes": ["заметка1", "заметка2"]})
+    mocker.patch(
+        "main.load_visits",
+        return_value={"visits": {"total": 5, "last_24h": 2, "unique_last_24h": 3}},
     )
+
+
+# 1. Проверка моками сервисов на главной странице
+@pytest.mark.asyncio
+async def test_index_route(client, mock_services):
     response = await client.get("/")
     assert response.status_code == 200
     assert "text/html" in response.headers["content-type"]
@@ -51,49 +45,21 @@ async def test_about_page(client):
     assert "<title>Важная информация</title>" in response.text
 
 
-# 3. Обработка ошибки запроса (fetch_data возвращает None)
-@pytest.fixture
-def mock_fetch_data(monkeypatch):
-    async def mocked(*args, **kwargs):
-        return None
-
-    monkeypatch.setattr("main.fetch_data", mocked)
-
-
+# 3. Ошибка одного из сервисов не ломает главную страницу
 @pytest.mark.asyncio
-async def test_fetch_data_handles_error(monkeypatch):
-    async def mock_httpx(*args, **kwargs):
-        raise httpx.ConnectError("Fail")
-
-    monkeypatch.setattr("httpx.AsyncClient.get", mock_httpx)
-    result = await fetch_data("https://fail.test")
-    assert result is None
+async def test_index_service_error(client, mock_services, mocker):
+    mocker.patch("main.load_weather", side_effect=RuntimeError("Fail"))
+    mocker.patch("main.load_cat", side_effect=RuntimeError("Fail"))
+    response = await client.get("/")
+    assert response.status_code == 200
+    assert WEATHER_FALLBACK["current_weather"]["weather_text"] in response.text
+    assert CAT_FALLBACK["url"] in response.text
+    assert "AUF" in response.text
 
 
 # 4. Обработка query параметра ?error=...
-@respx.mock
 @pytest.mark.asyncio
-async def test_query_error_parameter(client, mocker):
-    mocker.patch("main.log_visit")
-    respx.get("/api/weather").mock(
-        return_value=Response(
-            200, json={"weather": {"current_weather": {"weather_text": "Пасмурно"}}}
-        )
-    )
-    respx.get("/api/cat").mock(
-        return_value=Response(200, json={"cat": {"url": "https://kotik.jpg"}})
-    )
-    respx.get("/api/quotes/random").mock(
-        return_value=Response(200, json={"quotes": {"text": "AUF"}})
-    )
-    respx.get("/api/notes").mock(
-        return_value=Response(200, json={"notes": ["заметка1", "заметка2"]})
-    )
-    respx.get("/api/visits").mock(
-        return_value=Response(
-            200, json={"visits": {"total": 5, "last_24h": 2, "unique": 3}}
-        )
-    )
+async def test_query_error_parameter(client, mock_services):
     response = await client.get("/?error=ошибка123")
     assert response.status_code == 200
     assert "text/html" in response.headers["content-type"]
@@ -125,12 +91,11 @@ async def test_static_resources(client):
     assert "text/css" in response.headers["content-type"]
 
 
-# 6. Проверка функции fetch_data (успешный запрос)
+# 6. Главная страница не обращается к API по HTTP
 @respx.mock
 @pytest.mark.asyncio
-async def test_fetch_data_success():
-    url = "https://some.api"
-    respx.get(url).mock(return_value=Response(200, json={"result": "ok"}))
-    data = await fetch_data(url)
-    assert data == {"result": "ok"}
-    assert isinstance(data, dict)
+async def test_index_no_loopback(client, mock_services):
+    loopback = respx.route(host="localhost")
+    response = await client.get("/")
+    assert response.status_code == 200
+    assert not loopback.called
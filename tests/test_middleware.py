@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from middleware.log_api_requests import APILogMiddleware
+
+
+async def ok(request):
+    return JSONResponse({"ok": True}, status_code=201)
+
+
+async def stream(request):
+    async def chunks():
+        for chunk in (b"a", b"b", b"c"):
+            await asyncio.sleep(0.05)
+            yield chunk
+
+    return StreamingResponse(chunks())
+
+
+async def broken(request):
+    raise RuntimeError("boom")
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    records = []
+    monkeypatch.delenv("TESTING", raising=False)
+    monkeypatch.setattr(
+        "middleware.log_api_requests.api_log_writer.submit", records.append
+    )
+    return records
+
+
+@pytest_asyncio.fixture
+async def asgi_client():
+    app = Starlette(
+        routes=[
+            Route("/api/ok", ok, methods=["GET", "POST"]),
+            Route("/api/stream", stream),
+            Route("/api/broken", broken),
+            Route("/static/file", ok),
+        ]
+    )
+    app.add_middleware(APILogMiddleware)
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+# 1. Метод, путь, IP из x-real-ip и статус из http.response.start
+@pytest.mark.asyncio
+async def test_logs_request(asgi_client, logged):
+    await asgi_client.post("/api/ok", headers={"x-real-ip": "10.0.0.1"})
+
+    assert len(logged) == 1
+    record = logged[0]
+    assert record["method"] == "POST"
+    assert record["path"] == "/api/ok"
+    assert record["ip_address"] == "10.0.0.1"
+    assert record["status_code"] == 201
+    assert record["duration_ms"] >= 0
+
+
+# 2. Потоковый ответ измеряется до последнего фрагмента
+@pytest.mark.asyncio
+async def test_streaming_duration(asgi_client, logged):
+    response = await asgi_client.get("/api/stream")
+
+    assert response.content == b"abc"
+    assert len(logged) == 1
+    assert logged[0]["duration_ms"] >= 150
+
+
+# 3. Служебные пути не логируются
+@pytest.mark.asyncio
+async def test_excluded_paths(asgi_client, logged):
+    await asgi_client.get("/static/file")
+    await asgi_client.get("/favicon.ico")
+
+    assert logged == []
+
+
+# 4. Исключение в приложении логируется как 500
+@pytest.mark.asyncio
+async def test_exception_logged_as_500(asgi_client, logged):
+    await asgi_client.get("/api/broken")
+
+    assert len(logged) == 1
+    assert logged[0]["status_code"] == 500
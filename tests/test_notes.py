@@ -2,7 +2,7 @@
 import pytest
 
 from service.config import MAX_NOTE_LENGTH, MAX_NOTES
-from service.service import notes_storage
+from service.service import Snapshot, notes_storage
 
 test_notes_data = ["Тестовые данные", "test", "1"]
 
@@ -10,7 +10,13 @@ test_notes_data = ["Тестовые данные", "test", "1"]
 @pytest.fixture
 def mock_notes(monkeypatch):
     def _mock(data):
+        # Хранилище изменяет data на месте, срез собирается при каждом чтении
         monkeypatch.setattr(notes_storage, "get_all", lambda force_refresh=False: data)
+        monkeypatch.setattr(
+            notes_storage,
+            "snapshot",
+            lambda force_refresh=False: Snapshot(tuple(data), len(data)),
+        )
 
     return _mock
 
@@ -163,5 +169,49 @@ async def test_add_empty_note_html_accept(client, mock_notes):
     assert "error=" in response.headers["location"]
 
 
+# 9. Last-Modified по файлу заметок и If-Modified-Since → 304
+@pytest.mark.asyncio
+async def test_notes_last_modified(client, mock_notes):
+    mock_notes(test_notes_data)
+    response = await client.get("/api/notes")
+    last_modified = response.headers["last-modified"]
+
+    response = await client.get(
+        "/api/notes", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    # If-None-Match важнее If-Modified-Since
+    response = await client.get(
+        "/api/notes",
+        headers={"If-Modified-Since": last_modified, "If-None-Match": '"other"'},
+    )
+    assert response.status_code == 200
+    assert response.json()["notes"] == test_notes_data
+
+
 # Не до конца понял что тут тестируем
-# 9. Поведение, если background_tasks нет (например, мокнуть None),
+# 10. Поведение, если background_tasks нет (например, мокнуть None),
+
+
+# 11. Индекс сдвинулся: заметка с другим текстом не удаляется
+@pytest.mark.asyncio
+async def test_delete_note_expected_mismatch(client, mock_notes):
+    data = list(test_notes_data)
+    mock_notes(data)
+
+    response = await client.post(
+        "/api/notes/delete/0",
+        data={"expected": "удалённая раньше"},
+        headers={"accept": "application/json"},
+    )
+    assert response.status_code == 404
+    assert data == test_notes_data
+
+    response = await client.post(
+        "/api/notes/delete/0",
+        data={"expected": test_notes_data[0]},
+        headers={"accept": "application/json"},
+    )
+    assert response.status_code == 303
+    assert data == test_notes_data[1:]
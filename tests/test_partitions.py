@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from service.partitions import (
+    create_partition_sql,
+    maintain_table,
+    next_period,
+    parse_partition,
+    partition_name,
+    period_start,
+)
+
+NOW = datetime(2026, 12, 31, 23, 30, tzinfo=timezone.utc)
+
+
+# 1. Границы секций по дням и месяцам в UTC, с переходом через год
+def test_period_bounds():
+    assert period_start(NOW, "day") == datetime(2026, 12, 31, tzinfo=timezone.utc)
+    assert period_start(NOW, "month") == datetime(2026, 12, 1, tzinfo=timezone.utc)
+    assert next_period(period_start(NOW, "day"), "day") == datetime(
+        2027, 1, 1, tzinfo=timezone.utc
+    )
+    assert next_period(period_start(NOW, "month"), "month") == datetime(
+        2027, 1, 1, tzinfo=timezone.utc
+    )
+
+
+# 2. Имя секции однозначно восстанавливается в её начало
+def test_partition_names():
+    start = period_start(NOW, "month")
+    name = partition_name("visit_log", start, "month")
+
+    assert name == "visit_log_p202612"
+    assert parse_partition("visit_log", name, "month") == start
+    assert parse_partition("visit_log", "visit_log_archive", "month") is None
+    assert parse_partition("api_log", "api_log_p20261231", "day") == period_start(
+        NOW, "day"
+    )
+
+
+# 3. DDL секции с полуоткрытым диапазоном
+def test_create_partition_sql():
+    sql = create_partition_sql("api_log", period_start(NOW, "day"), "day")
+    assert sql == (
+        "CREATE TABLE IF NOT EXISTS api_log_p20261231 PARTITION OF api_log "
+        "FOR VALUES FROM ('2026-12-31T00:00:00+00:00') "
+        "TO ('2027-01-01T00:00:00+00:00')"
+    )
+
+
+# 4. Обслуживание создаёт секции вперёд и удаляет только полностью устаревшие
+@pytest.mark.asyncio
+@pytest.mark.parametrize("expired", ["drop", "detach"])
+async def test_maintain_table(mocker, expired):
+    db = mocker.AsyncMock()
+    listing = mocker.Mock()
+    listing.scalars.return_value.all.return_value = [
+        "api_log_p20261129",
+        "api_log_p20261130",
+        "api_log_p20261201",  # часть строк ещё в пределах срока хранения
+        "api_log_archive",
+    ]
+    db.execute.return_value = listing
+
+    report = await maintain_table(
+        db, "api_log", "day", retention_days=30, premake=2, expired=expired, now=NOW
+    )
+
+    statements = [str(call.args[0]) for call in db.execute.await_args_list]
+    assert report["created"] == [
+        "api_log_p20261231",
+        "api_log_p20270101",
+        "api_log_p20270102",
+    ]
+    assert report["removed"] == ["api_log_p20261129", "api_log_p20261130"]
+    assert "ALTER TABLE api_log DETACH PARTITION api_log_p20261129" in statements
+    assert ("DROP TABLE api_log_p20261130" in statements) == (expired == "drop")
+    assert not any("api_log_p20261201" in s for s in statements if "DETACH" in s)
+    db.commit.assert_awaited_once()
+
+
+# 5. Строки из DEFAULT переносятся в создаваемые секции, включая прошедшие
+@pytest.mark.asyncio
+async def test_maintain_table_moves_default_rows(mocker):
+    listing = mocker.Mock()
+    listing.scalars.return_value.all.return_value = [
+        "visit_log_default",
+        "visit_log_p202612",
+    ]
+    bounds = mocker.Mock()
+    bounds.one.return_value = (
+        datetime(2026, 10, 5, tzinfo=timezone.utc),
+        datetime(2026, 11, 20, tzinfo=timezone.utc),
+    )
+    db = mocker.AsyncMock()
+    db.execute.side_effect = lambda sql, *a: bounds if "min(" in str(sql) else listing
+
+    report = await maintain_table(
+        db,
+        "visit_log",
+        "month",
+        retention_days=365,
+        premake=1,
+        now=NOW,
+        column="visited_at",
+    )
+
+    statements = [str(call.args[0]) for call in db.execute.await_args_list]
+    assert report["created"] == [
+        "visit_log_p202610",
+        "visit_log_p202611",
+        "visit_log_p202612",
+        "visit_log_p202701",
+    ]
+    moves = [s for s in statements if s.startswith("INSERT INTO visit_log ")]
+    assert len(moves) == 2
+    assert (
+        statements.count("ALTER TABLE visit_log DETACH PARTITION visit_log_default")
+        == 2
+    )
+    assert (
+        statements.count(
+            "ALTER TABLE visit_log ATTACH PARTITION visit_log_default DEFAULT"
+        )
+        == 2
+    )
+    assert not any("visit_log_default" in s for s in statements if "DROP" in s)
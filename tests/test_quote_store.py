@@ -0,0 +1,80 @@
+# tests/test_quote_store.py
+import json
+import random
+
+import pytest
+
+from service.quote_store import QuoteStore, QuoteStoreLoader, build_quote_store
+
+quotes = [
+    {"ID": 0, "author": "Шлёпа", "text": "Пельмени это очень вкусно"},
+    {"ID": 1, "author": "Pytest", "text": "Тестируй что бы не было багов, AUF"},
+    {"ID": 2, "author": "Шлёпа", "text": "Если тебе было весело, то нечего сожалеть."},
+]
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "quotes.json"
+    source.write_text(json.dumps(quotes, ensure_ascii=False), encoding="utf-8")
+    return source, tmp_path / "quotes.bin"
+
+
+# 1. Собранный файл читается по номеру так же, как исходный JSON
+def test_build_and_read(files):
+    source, target = files
+    assert build_quote_store(source, target) == 3
+
+    store = QuoteStore(target)
+    assert len(store) == 3
+    assert [store[i] for i in range(len(store))] == quotes
+    assert random.choice(store) in quotes
+    with pytest.raises(IndexError):
+        store[3]
+    store.close()
+
+
+# 2. Одинаковые авторы хранятся в куче один раз
+def test_heap_deduplication(files):
+    source, target = files
+    build_quote_store(source, target)
+    assert target.read_bytes().count("Шлёпа".encode("utf-8")) == 1
+
+
+# 3. Без quotes.bin или при изменённом quotes.json загрузчик отдаёт None
+def test_loader_fallback(files):
+    source, target = files
+    loader = QuoteStoreLoader(target, source, check_interval=0)
+    assert loader.get() is None
+
+    build_quote_store(source, target)
+    assert loader.get()[1] == quotes[1]
+
+    source.write_text(json.dumps(quotes[:1], ensure_ascii=False), encoding="utf-8")
+    assert loader.get() is None
+
+    build_quote_store(source, target)
+    assert len(loader.get()) == 1
+
+
+# 4. Файл чужого формата не открывается
+def test_invalid_file(files):
+    source, target = files
+    target.write_bytes(b"not a quote store")
+    assert QuoteStoreLoader(target, source, check_interval=0).get() is None
+
+
+# 5. Порядок ID записывается при сборке: бинарный поиск курсора только по нему
+def test_ids_sorted_flag(files):
+    source, target = files
+    build_quote_store(source, target)
+    store = QuoteStore(target)
+    assert store.ids_sorted
+    store.close()
+
+    shuffled = [quotes[1], quotes[0], quotes[2]]
+    source.write_text(json.dumps(shuffled, ensure_ascii=False), encoding="utf-8")
+    build_quote_store(source, target)
+    store = QuoteStore(target)
+    assert not store.ids_sorted
+    store.close()
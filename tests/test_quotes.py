@@ -1,7 +1,10 @@
 # tests/test_quotes.py
+import json
+
 import pytest
 
-from service.service import quotes_storage
+from service.search import QuoteIndexer
+from service.service import Snapshot, quotes_storage
 
 test_quotes_data = [
     {"ID": 0, "author": "Pytest", "text": "Тестируй что бы не было багов, AUF"},
@@ -18,7 +21,14 @@ test_quotes_data = [
 @pytest.fixture
 def mock_quotes(monkeypatch):
     def _mock(data):
-        monkeypatch.setattr(quotes_storage, "get_all", lambda force_refresh=False: data)
+        snapshot = Snapshot(tuple(data), 1)
+        monkeypatch.setattr(
+            quotes_storage, "snapshot", lambda force_refresh=False: snapshot
+        )
+        # Собранный quotes.bin не должен подменять данные мока
+        monkeypatch.setattr("app.quotes.quote_store", lambda: None)
+        # Свежий индекс: прежний, от другого теста, отдавался бы до пересборки
+        monkeypatch.setattr("app.quotes.quote_index", QuoteIndexer().get)
 
     return _mock
 
@@ -87,3 +97,130 @@ async def test_error_get_all_quotes(client, mock_quotes):
 
     assert response.status_code == 404
     assert response.json()["detail"] == {"error": "Цитаты не найдены."}
+
+
+# 7. Постраничная выдача по курсору after_id
+@pytest.mark.asyncio
+async def test_quotes_keyset_pagination(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    response = await client.get("/api/quotes?limit=3")
+    first = response.json()
+    assert [q["ID"] for q in first["quotes"]] == [0, 1, 2]
+    assert first["next_after_id"] == 2
+
+    response = await client.get("/api/quotes?limit=3&after_id=2")
+    second = response.json()
+    assert [q["ID"] for q in second["quotes"]] == [3]
+    assert second["next_after_id"] is None
+
+    response = await client.get("/api/quotes?limit=0")
+    assert response.status_code == 422
+
+
+# 8. Поиск тоже отдаётся страницами в порядке результатов
+@pytest.mark.asyncio
+async def test_search_pagination(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    response = await client.get("/api/quotes/search?author=Шлёпа&limit=1")
+    first = response.json()
+    assert first["quotes"] == [test_quotes_data[2]]
+
+    response = await client.get(
+        f"/api/quotes/search?author=Шлёпа&limit=1&after_id={first['next_after_id']}"
+    )
+    assert response.json() == {"quotes": [test_quotes_data[3]], "next_after_id": None}
+
+
+# 9. Accept: application/x-ndjson — по цитате в строке
+@pytest.mark.asyncio
+async def test_quotes_ndjson(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    headers = {"Accept": "application/x-ndjson"}
+    response = await client.get("/api/quotes?after_id=0", headers=headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == test_quotes_data[1:]
+
+    response = await client.get("/api/quotes/search?q=пельмени", headers=headers)
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        test_quotes_data[3]
+    ]
+
+
+# 10. ETag: повторный запрос с If-None-Match получает пустой 304
+@pytest.mark.asyncio
+async def test_quotes_etag(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    response = await client.get("/api/quotes/1")
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+
+    response = await client.get("/api/quotes/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = await client.get("/api/quotes/2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    # Некэшируемые ответы получают ETag по содержимому
+    response = await client.get("/api/quotes/search?author=Шлёпа")
+    response = await client.get(
+        "/api/quotes/search?author=Шлёпа",
+        headers={"If-None-Match": f'W/{response.headers["etag"]}'},
+    )
+    assert response.status_code == 304
+
+
+# 11. ID не по порядку: курсор ищется перебором, страницы не теряются
+@pytest.mark.asyncio
+async def test_pagination_unsorted_ids(client, mock_quotes):
+    shuffled = [test_quotes_data[i] for i in (2, 0, 3, 1)]
+    mock_quotes(shuffled)
+
+    seen, after = [], None
+    while True:
+        url = "/api/quotes?limit=1" + (
+            f"&after_id={after}" if after is not None else ""
+        )
+        body = (await client.get(url)).json()
+        seen += [q["ID"] for q in body["quotes"]]
+        after = body["next_after_id"]
+        if after is None:
+            break
+    assert seen == [2, 0, 3, 1]
+
+
+# 12. Страницы поиска по релевантности складываются в полную выдачу
+@pytest.mark.asyncio
+async def test_search_pagination_ranked(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    full = (await client.get("/api/quotes/search?q=ш")).json()["quotes"]
+    assert len(full) > 1
+
+    seen, after = [], None
+    while True:
+        url = "/api/quotes/search?q=ш&limit=1"
+        if after is not None:
+            url += f"&after_id={after}"
+        body = (await client.get(url)).json()
+        seen += body["quotes"]
+        after = body["next_after_id"]
+        if after is None:
+            break
+    assert seen == full
+
+    response = await client.get("/api/quotes/search?q=борщ&limit=1")
+    assert response.status_code == 404
+
+
+# 13. Случайная цитата не закрепляется в общем кэше и у браузера
+@pytest.mark.asyncio
+async def test_random_quote_not_shared(client, mock_quotes):
+    mock_quotes(test_quotes_data)
+    response = await client.get("/api/quotes/random")
+
+    assert response.status_code == 200
+    assert "x-accel-expires" not in response.headers
+    assert "last-modified" not in response.headers
+    assert "public" not in response.headers.get("cache-control", "")
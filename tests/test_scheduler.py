@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from service.cache import ttl_logic
+from service.scheduler import RefreshScheduler
+
+
+# 1. Запуск за lead..lead+jitter секунд до конца интервала
+def test_next_delay_before_interval_end():
+    scheduler = RefreshScheduler(lead=20, jitter=10)
+    job = scheduler.register("job", None, interval=300)
+
+    # 100 секунд от начала интервала, до конца 200
+    for _ in range(20):
+        delay = scheduler.next_delay(job, now=3000 + 100)
+        assert 170 <= delay <= 180
+
+
+# 2. Если окно уже пройдено, запуск переносится на следующий интервал
+def test_next_delay_rolls_over():
+    scheduler = RefreshScheduler(lead=20, jitter=0)
+    job = scheduler.register("job", None, interval=300)
+
+    delay = scheduler.next_delay(job, now=3000 + 290)
+    assert delay == pytest.approx(290)
+
+
+# 3. Таймаут и ошибка обновления считаются и не роняют планировщик
+@pytest.mark.asyncio
+async def test_run_job_timeout_and_error():
+    scheduler = RefreshScheduler(timeout=0.01)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def broken():
+        raise RuntimeError("upstream")
+
+    slow_job = scheduler.register("slow", slow, interval=60)
+    broken_job = scheduler.register("broken", broken, interval=60)
+
+    assert await scheduler.run_job(slow_job) is False
+    assert await scheduler.run_job(broken_job) is False
+    assert slow_job.failures == broken_job.failures == 1
+
+
+# 4. Одновременно выполняется не больше max_concurrency обновлений
+@pytest.mark.asyncio
+async def test_run_job_concurrency_limit():
+    scheduler = RefreshScheduler(max_concurrency=2, timeout=1)
+    active = peak = 0
+
+    async def refresh():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+
+    jobs = [scheduler.register(f"job{i}", refresh, interval=60) for i in range(5)]
+    await asyncio.gather(*(scheduler.run_job(job) for job in jobs))
+
+    assert peak == 2
+    assert all(job.runs == 1 for job in jobs)
+
+
+# 5. start прогревает ключи, stop отменяет задачи
+@pytest.mark.asyncio
+async def test_start_warms_and_stop_cancels():
+    scheduler = RefreshScheduler()
+    warmed = asyncio.Event()
+
+    async def refresh():
+        warmed.set()
+
+    scheduler.register("job", refresh, interval=3600)
+    await scheduler.start()
+    await asyncio.wait_for(warmed.wait(), timeout=1)
+
+    tasks = list(scheduler._tasks)
+    await scheduler.stop()
+    assert all(task.done() for task in tasks)
+
+
+# 6. Данные, полученные у конца интервала, живут и следующий интервал
+def test_ttl_logic_min_ttl_extends_to_next_interval():
+    data = {"current_weather": {"temp": 22}}
+    ttl = ttl_logic(data, return_ttl=True, min_ttl=901)
+    assert 900 < ttl <= 1800
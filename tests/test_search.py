@@ -0,0 +1,111 @@
+import pytest
+
+import asyncio
+
+from service.search import QuoteIndex, QuoteIndexer, normalize
+from service.service import Snapshot, quotes_storage
+
+QUOTES = (
+    {"ID": 0, "author": "Шлёпа", "text": "Пельмени это очень вкусно"},
+    {"ID": 1, "author": "Стетхэм", "text": "Ёлки зелёные, где пельмени?"},
+    {"ID": 2, "author": "Пацанский философ", "text": "Не закусывай динамит"},
+    {"ID": 3, "author": "Шлепа", "text": "Если тебе было весело, то нечего сожалеть"},
+)
+
+
+# 1. Регистр и «ё» не важны
+def test_normalize():
+    assert normalize("ЁЛКИ Зелёные") == "елки зеленые"
+    index = QuoteIndex(QUOTES)
+
+    assert [q["ID"] for q in index.search(author="шлепа")] == [0, 3]
+    assert [q["ID"] for q in index.search(q="ЕЛКИ")] == [1]
+
+
+# 2. Слова совпадают по префиксу, все слова запроса обязательны
+def test_prefix_and_all_terms():
+    index = QuoteIndex(QUOTES)
+
+    assert [q["ID"] for q in index.search(q="пельм")] == [0, 1]
+    assert [q["ID"] for q in index.search(q="пельмени вкус")] == [0]
+    assert index.search(q="пельмени динамит") == []
+    assert [q["ID"] for q in index.search(author="пацан фил")] == [2]
+
+
+# 3. Точное совпадение и совпадение в авторе выше префиксного
+def test_ranking():
+    quotes = (
+        {"ID": 0, "author": "Кто-то", "text": "весельчак пришёл"},
+        {"ID": 1, "author": "Другой", "text": "весело было"},
+        {"ID": 2, "author": "Весело", "text": "ничего"},
+    )
+    index = QuoteIndex(quotes)
+
+    assert [q["ID"] for q in index.search(q="весело")] == [2, 1]
+    # Равные по весу идут в порядке корпуса
+    assert [q["ID"] for q in index.search(q="весел")] == [2, 0, 1]
+
+
+# 4. author и q сочетаются; без условий возвращается весь корпус
+def test_author_with_query():
+    index = QuoteIndex(QUOTES)
+
+    assert [q["ID"] for q in index.search(q="весело", author="шлёпа")] == [3]
+    assert index.search() == list(QUOTES)
+
+
+# 5. Индекс перестраивается, только когда меняется срез хранилища
+@pytest.mark.asyncio
+async def test_rebuilt_on_snapshot_change(monkeypatch):
+    snapshot = Snapshot(QUOTES, 1)
+    monkeypatch.setattr(
+        quotes_storage, "snapshot", lambda force_refresh=False: snapshot
+    )
+    indexer = QuoteIndexer()
+    first = await indexer.get()
+    assert await indexer.get() is first
+
+    snapshot = Snapshot(QUOTES[:2], 2)
+    # Пока новый индекс строится, отдаётся прежний
+    assert await indexer.get() is first
+    await indexer._rebuild
+    second = await indexer.get()
+    assert second is not first
+    assert len(second.search()) == 2
+
+
+# 6. Сборка в потоке одна на все запросы и не блокирует event loop
+@pytest.mark.asyncio
+async def test_rebuild_coalesced_off_loop(monkeypatch, mocker):
+    snapshot = Snapshot(QUOTES, 1)
+    monkeypatch.setattr(
+        quotes_storage, "snapshot", lambda force_refresh=False: snapshot
+    )
+    indexer = QuoteIndexer()
+    first = await indexer.get()
+    snapshot = Snapshot(QUOTES[:3], 2)
+
+    to_thread = mocker.spy(asyncio, "to_thread")
+    results = await asyncio.gather(*(indexer.get(force_refresh=True) for _ in range(5)))
+    assert all(index is first for index in results)
+    await indexer._rebuild
+    assert to_thread.call_count == 1
+    assert len((await indexer.get()).search()) == 3
+
+
+# 7. Полнотекстовый поиск через API
+@pytest.mark.asyncio
+async def test_search_route_q(client, monkeypatch):
+    snapshot = Snapshot(QUOTES, 1)
+    monkeypatch.setattr(
+        quotes_storage, "snapshot", lambda force_refresh=False: snapshot
+    )
+
+    monkeypatch.setattr("app.quotes.quote_index", QuoteIndexer().get)
+
+    response = await client.get("/api/quotes/search", params={"q": "пельмени"})
+    assert response.status_code == 200
+    assert [q["ID"] for q in response.json()["quotes"]] == [0, 1]
+
+    response = await client.get("/api/quotes/search", params={"q": "борщ"})
+    assert response.status_code == 404
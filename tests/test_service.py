@@ -1,4 +1,6 @@
 # tests/test_service.py
+import multiprocessing
+
 import pytest
 
 from service.service import *
@@ -175,3 +177,270 @@ def test_add_raises_if_immutable(tmp_path):
     storage = JsonStorage(file, mutable=False)
     with pytest.raises(RuntimeError, match="только для чтения"):
         storage.add("new")
+
+
+# 15. Журнал: изменения дописываются, снимок не перезаписывается
+def test_journal_appends_instead_of_rewrite(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps(["a"]))
+    storage = JournalStorage(file, fsync="never")
+
+    storage.add("b")
+    snapshot = file.read_text(encoding="utf-8")
+    storage.add("c")
+    storage.delete(0)
+
+    assert file.read_text(encoding="utf-8") == snapshot
+    assert storage.get_all() == ["b", "c"]
+    # Новый процесс восстанавливает состояние из снимка и журнала
+    assert JournalStorage(file).get_all() == ["b", "c"]
+
+
+# 16. Оборванная последняя строка журнала отбрасывается
+def test_journal_torn_tail(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    storage = JournalStorage(file, fsync="never")
+    storage.add("целая")
+
+    with open(storage.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "item": "обор')
+
+    restored = JournalStorage(file)
+    assert restored.get_all() == ["целая"]
+    restored.add("после")
+    assert JournalStorage(file).get_all() == ["целая", "после"]
+
+
+# 17. Журнал сжимается в фоне после порога
+def test_journal_compaction(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    storage = JournalStorage(file, fsync="never", compact_bytes=200)
+
+    for i in range(10):
+        storage.add(f"заметка {i}")
+    storage._compaction.join(timeout=5)
+
+    expected = [f"заметка {i}" for i in range(10)]
+    snapshot = json.loads(file.read_text(encoding="utf-8"))
+    # В снимок попало всё, что было записано к моменту сжатия
+    assert snapshot and snapshot == expected[: len(snapshot)]
+    assert JournalStorage(file).get_all() == expected
+
+
+# 18. Прерванное сжатие: снимок обновлён, журнал остался старым
+def test_journal_interrupted_compaction(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps(["a"]))
+    storage = JournalStorage(file, fsync="never")
+    storage.add("b")
+    old_journal = storage.journal_path.read_bytes()
+
+    storage.compact()
+    storage.journal_path.write_bytes(old_journal)
+
+    # Записи журнала уже в снимке и не применяются повторно
+    restored = JournalStorage(file)
+    assert restored.get_all() == ["a", "b"]
+    restored.add("c")
+    assert JournalStorage(file).get_all() == ["a", "b", "c"]
+
+
+# 19. force_refresh перечитывает файл, только если он изменился
+def test_force_refresh_reads_only_changed(tmp_path, mocker):
+    file = tmp_path / "data.json"
+    file.write_text(json.dumps(["first"]))
+    storage = JsonStorage(file, mutable=False)
+    load = mocker.spy(storage, "_load_file")
+
+    storage.get_all()
+    storage.get_all(force_refresh=True)
+    storage.get_all(force_refresh=True)
+    assert load.call_count == 1
+
+    file.write_text(json.dumps(["second", "changed"]))
+    assert storage.get_all(force_refresh=True) == ["second", "changed"]
+    assert load.call_count == 2
+
+
+# 20. Без force_refresh файл проверяется не чаще check_interval
+def test_check_interval_throttles_stat(tmp_path):
+    file = tmp_path / "data.json"
+    file.write_text(json.dumps(["first"]))
+    storage = JsonStorage(file, mutable=False, check_interval=3600)
+    storage.get_all()
+
+    file.write_text(json.dumps(["updated"]))
+    assert storage.get_all() == ["first"]
+
+    storage.check_interval = 0
+    assert storage.get_all() == ["updated"]
+
+
+# 21. Запись одного воркера видна другому без nocache
+def test_journal_changes_visible_across_instances(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    writer = JournalStorage(file, fsync="never")
+    reader = JournalStorage(file)
+    reader.check_interval = 0
+    assert reader.get_all() == []
+
+    writer.add("от первого воркера")
+    assert reader.get_all() == ["от первого воркера"]
+
+    reader.delete(0)
+    writer.check_interval = 0
+    assert writer.get_all() == []
+
+
+# 22. Срез общий для всех чтений, изменение создаёт новый с новой версией
+def test_snapshot_copy_on_write(tmp_path):
+    file = tmp_path / "data.json"
+    file.write_text(json.dumps(["a", "b"]))
+    storage = JsonStorage(file, mutable=True)
+
+    first = storage.snapshot()
+    assert storage.snapshot() is first
+    assert first.items == ("a", "b")
+
+    storage.add("c")
+    second = storage.snapshot()
+
+    assert first.items == ("a", "b")
+    assert second.items == ("a", "b", "c")
+    assert second.version > first.version
+    assert storage.version == second.version
+
+
+def _stress_worker(storage_cls, path, worker: int, count: int) -> None:
+    if storage_cls is JournalStorage:
+        storage = JournalStorage(path, fsync="never", compact_bytes=512)
+    else:
+        storage = JsonStorage(path, mutable=True)
+    for i in range(count):
+        storage.add(f"{worker}-{i}")
+        if i % 5 == 4:
+            storage.delete(0)
+    compaction = getattr(storage, "_compaction", None)
+    if compaction is not None:
+        compaction.join()
+
+
+# 23. Несколько процессов пишут в одно хранилище и не теряют записи
+@pytest.mark.parametrize("storage_cls", [JsonStorage, JournalStorage])
+def test_multiprocess_writes(tmp_path, storage_cls):
+    pytest.importorskip("fcntl")
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    workers, count = 4, 25
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_stress_worker, args=(storage_cls, file, w, count))
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    items = storage_cls(file).get_all()
+    # Каждый воркер удалил count / 5 записей
+    assert len(items) == workers * (count - count // 5)
+    assert len(set(items)) == len(items)
+    # Файл всегда целый: читается как JSON-список
+    assert isinstance(json.loads(file.read_text(encoding="utf-8")), list)
+
+
+# 24. Сбой чтения снимка: прежний срез остаётся, изменения отклоняются, диск не трогается
+@pytest.mark.parametrize("storage_cls", [JsonStorage, JournalStorage])
+def test_unreadable_file_blocks_mutations(tmp_path, mocker, storage_cls):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    storage = storage_cls(file)
+    storage.mutable = True
+    storage.add("a")
+    storage.add("b")
+    on_disk = {p: p.read_bytes() for p in tmp_path.iterdir() if p.suffix != ".lock"}
+
+    def failing_open(path, *args, **kwargs):
+        if path == file:
+            raise OSError("EIO")
+        return open(path, *args, **kwargs)
+
+    broken = mocker.patch("service.service.open", create=True, side_effect=failing_open)
+    storage._signature = None
+
+    assert storage.get_all(force_refresh=True) == ["a", "b"]
+    with pytest.raises(StorageReadError):
+        storage.add("c")
+    with pytest.raises(StorageReadError):
+        storage.delete(0)
+    assert {
+        p: p.read_bytes() for p in tmp_path.iterdir() if p.suffix != ".lock"
+    } == on_disk
+
+    # Файл снова читается — изменения идут поверх настоящего состояния
+    mocker.stop(broken)
+    storage.add("c")
+    assert storage_cls(file).get_all() == ["a", "b", "c"]
+
+
+# 25. Отсутствующий файл — пустое хранилище, а не ошибка
+def test_missing_file_is_empty(tmp_path):
+    storage = JournalStorage(tmp_path / "notes.json")
+
+    assert storage.get_all() == []
+    storage.add("первая")
+    assert JournalStorage(tmp_path / "notes.json").get_all() == ["первая"]
+
+
+def _limit_worker(storage_cls, path, worker: int, count: int, limit: int) -> None:
+    storage = storage_cls(path)
+    storage.mutable = True
+    for i in range(count):
+        try:
+            storage.add(f"{worker}-{i}", max_items=limit)
+        except StorageFullError:
+            pass
+
+
+# 26. Лимит проверяется под блокировкой: процессы вместе не превышают max_items
+@pytest.mark.parametrize("storage_cls", [JsonStorage, JournalStorage])
+def test_multiprocess_limit(tmp_path, storage_cls):
+    pytest.importorskip("fcntl")
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps([]))
+    workers, count, limit = 4, 10, 15
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_limit_worker, args=(storage_cls, file, w, count, limit))
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert len(storage_cls(file).get_all()) == limit
+
+
+# 27. delete сверяет индекс и значение с состоянием на диске
+def test_delete_checks_expected(tmp_path):
+    file = tmp_path / "notes.json"
+    file.write_text(json.dumps(["a", "b", "c"]))
+    storage = JournalStorage(file)
+    # Другой процесс удалил первую заметку, индексы сдвинулись
+    JournalStorage(file).delete(0, expected="a")
+
+    with pytest.raises(ItemNotFoundError):
+        storage.delete(1, expected="b")
+    with pytest.raises(ItemNotFoundError):
+        storage.delete(5)
+    storage.delete(0, expected="b")
+    assert JournalStorage(file).get_all() == ["c"]
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.visits import load_visits
+from service.config import VISITS_UNIQUE
+from service.logging_utils import log_visit
+from service.visit_stats import (
+    VisitSketches,
+    hour_bucket,
+    read_visit_stats,
+    record_visit,
+    window_start,
+)
+
+
+@pytest.fixture
+def exact_mode(mocker):
+    mocker.patch.dict(VISITS_UNIQUE, mode="exact")
+
+
+@pytest.fixture
+def hll_mode(mocker):
+    mocker.patch.dict(VISITS_UNIQUE, mode="hll")
+    sketches = VisitSketches(error=0.02, sync_interval=60)
+    mocker.patch("service.visit_stats.visit_sketches", sketches)
+    return sketches
+
+
+# 1. Статистика читается из агрегатов тремя запросами
+@pytest.mark.asyncio
+async def test_load_visits(mocker, exact_mode):
+    db = mocker.AsyncMock()
+    db.scalar.side_effect = [100, 25, 15]
+
+    result = await load_visits(db)
+
+    assert db.scalar.await_count == 3
+    assert result == {
+        "visits": {"total": 100, "last_24h": 25, "unique_last_24h": 15},
+        "status": "success",
+    }
+
+
+# 2. Посещение сохраняется через асинхронную сессию
+@pytest.mark.asyncio
+async def test_log_visit(mocker, exact_mode):
+    db = mocker.AsyncMock()
+    db.add = mocker.Mock()
+    request = mocker.Mock()
+    request.headers = {"x-real-ip": "10.0.0.1"}
+    request.url.path = "/"
+    request.method = "GET"
+
+    await log_visit(request, db)
+
+    visit = db.add.call_args.args[0]
+    assert visit.ip_address == "10.0.0.1"
+    # Визит, почасовой IP, почасовой счётчик и общий счётчик — одна транзакция
+    assert db.scalar.await_count == 1
+    assert db.execute.await_count == 2
+    db.commit.assert_awaited_once()
+
+
+# 3. Суточное окно — текущий час и 23 предыдущих
+def test_window_start():
+    now = datetime(2026, 1, 2, 10, 45, tzinfo=timezone.utc)
+    assert window_start(now) == datetime(2026, 1, 1, 11, 0, tzinfo=timezone.utc)
+    assert hour_bucket(now) == datetime(2026, 1, 2, 10, 0, tzinfo=timezone.utc)
+
+
+# 4. Upsert агрегатов компилируется в ON CONFLICT для PostgreSQL
+@pytest.mark.asyncio
+async def test_record_visit_statements(mocker, exact_mode):
+    db = mocker.AsyncMock()
+    db.scalar.return_value = None  # IP в этом часе уже встречался
+
+    await record_visit(db, "10.0.0.1")
+
+    dialect = postgresql.dialect()
+    ip_sql = str(db.scalar.await_args.args[0].compile(dialect=dialect))
+    hourly_sql, counter_sql = (
+        str(call.args[0].compile(dialect=dialect))
+        for call in db.execute.await_args_list
+    )
+    assert "ON CONFLICT DO NOTHING" in ip_sql
+    assert "ON CONFLICT (bucket) DO UPDATE" in hourly_sql
+    assert "ON CONFLICT (name) DO UPDATE" in counter_sql
+
+
+# 5. В режиме hll IP не пишется в БД, а попадает в скетч часа
+@pytest.mark.asyncio
+async def test_record_visit_hll(mocker, hll_mode):
+    db = mocker.AsyncMock()
+    db.execute.return_value = []  # сохранённых скетчей нет
+
+    for i in range(300):
+        await record_visit(db, f"10.0.{i % 3}.{i % 100}")
+
+    db.scalar.assert_not_awaited()
+    assert db.execute.await_count == 600  # почасовой счётчик и общий
+    stats = await read_visit_stats(db)
+    assert abs(stats["unique_last_24h"] - 300) <= 10
+
+
+# 6. Сутки — объединение 24 почасовых скетчей, старые часы не учитываются
+def test_sketches_window(hll_mode):
+    now = datetime(2026, 1, 2, 10, 45, tzinfo=timezone.utc)
+    for hours_ago in range(30):
+        bucket = hour_bucket(now) - timedelta(hours=hours_ago)
+        for i in range(100):
+            hll_mode.add(bucket, f"{hours_ago}-{i}")
+        # Часть посетителей возвращается каждый час
+        for i in range(50):
+            hll_mode.add(bucket, f"regular-{i}")
+
+    estimate = hll_mode.estimate(now)
+
+    assert abs(estimate - (24 * 100 + 50)) / 2450 < 0.06
+    # Часы за пределами окна ещё не сохранены, поэтому пока в памяти
+    assert len(hll_mode._sketches) == 30
+
+
+# 7. Сохранение объединяет скетч с записанным другим процессом
+@pytest.mark.asyncio
+async def test_sketches_save_merges_stored(mocker, hll_mode):
+    bucket = hour_bucket(datetime.now(timezone.utc))
+    other = VisitSketches(error=0.02)
+    for i in range(200):
+        other.add(bucket, f"other-{i}")
+    for i in range(100):
+        hll_mode.add(bucket, f"mine-{i}")
+
+    db = mocker.AsyncMock()
+    db.scalar.return_value = other._sketches[bucket].to_bytes()
+
+    assert await hll_mode.save(db) == 1
+
+    upsert = db.execute.await_args.args[0]
+    sql = str(upsert.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (bucket) DO UPDATE" in sql
+    assert abs(hll_mode.estimate() - 300) <= 10
+    assert not hll_mode._dirty
+    db.commit.assert_awaited_once()
+
+
+# 8. Если запись не удалась, скетчи остаются изменёнными до следующей попытки
+@pytest.mark.asyncio
+async def test_sketches_save_failure(mocker, hll_mode):
+    hll_mode.add(hour_bucket(datetime.now(timezone.utc)), "10.0.0.1")
+    db = mocker.AsyncMock()
+    db.scalar.return_value = None
+    db.commit.side_effect = RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        await hll_mode.save(db)
+
+    assert len(hll_mode._dirty) == 1